@@ -0,0 +1,87 @@
+"""CoAP codec benchmark."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import argparse
+import hashlib
+import json
+import timeit
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import unpad
+
+from pyairctrl.coap_codec import CoAPCodec
+
+STATUS = {
+    "state": {
+        "reported": {
+            "name": "Living Room",
+            "om": "s",
+            "pwr": "1",
+            "cl": False,
+            "aqil": 0,
+            "uil": "1",
+            "mode": "A",
+            "pm25": 4,
+            "iaql": 1,
+            "aqit": 4,
+            "ddp": "1",
+            "fltsts0": 287,
+            "fltsts1": 2087,
+            "fltsts2": 2567,
+        }
+    }
+}
+
+
+def decrypt_with_strings(encrypted_payload):
+    # the decode path before CoAPCodec, kept for comparison
+    encoded_counter = encrypted_payload[0:8]
+    encoded_message = encrypted_payload[8:-64]
+    digest = encrypted_payload[-64:]
+    calculated_digest = (
+        hashlib.sha256((encoded_counter + encoded_message).encode("utf8"))
+        .hexdigest()
+        .upper()
+    )
+    if digest != calculated_digest:
+        raise ValueError("wrong digest")
+    key_and_iv = hashlib.md5(("JiangPan" + encoded_counter).encode()).hexdigest().upper()
+    aes = AES.new(
+        bytes(key_and_iv[:16], "utf8"), AES.MODE_CBC, bytes(key_and_iv[16:], "utf8")
+    )
+    decoded_message = aes.decrypt(bytes.fromhex(encoded_message))
+    return unpad(decoded_message, 16, style="pkcs7").decode("utf8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CoAP payload decoding")
+    parser.add_argument("-n", type=int, default=20000, help="messages per run")
+    args = parser.parse_args()
+
+    codec = CoAPCodec()
+    payload = json.dumps(STATUS)
+    # a device sends a new counter with every message
+    messages = [
+        codec.encrypt("{:08X}".format(0x0170B935 + i), payload) for i in range(args.n)
+    ]
+    messages_bytes = [m.encode("ascii") for m in messages]
+
+    def run(decode, inputs):
+        for message in inputs:
+            decode(message)
+
+    for name, decode, inputs in [
+        ("strings", decrypt_with_strings, messages),
+        ("codec", codec.decrypt, messages_bytes),
+    ]:
+        elapsed = min(timeit.repeat(lambda: run(decode, inputs), number=1, repeat=3))
+        print(
+            "{:8} {:8.2f} us/message {:10.0f} messages/s".format(
+                name, elapsed / args.n * 1e6, args.n / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""HTTP codec benchmark."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import argparse
+import base64
+import json
+import timeit
+from collections import OrderedDict
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad, unpad
+
+from pyairctrl.http_codec import HTTPCodec
+
+SESSION_KEY = b"0123456789abcdef"
+
+STATUS = {
+    "om": "s",
+    "pwr": "1",
+    "cl": False,
+    "aqil": 0,
+    "uil": "1",
+    "dt": 0,
+    "dtrs": 0,
+    "mode": "A",
+    "pm25": 4,
+    "iaql": 1,
+    "aqit": 4,
+    "ddp": "1",
+    "err": 0,
+    "wl": 100,
+    "fltt1": "A3",
+    "fltt2": "C7",
+    "fltsts0": 287,
+    "fltsts1": 2087,
+    "fltsts2": 2567,
+}
+
+
+def decode_with_strings(data):
+    # the decode path before HTTPCodec, kept for comparison
+    payload = base64.b64decode(data.decode("ascii"))
+    cipher = AES.new(SESSION_KEY, AES.MODE_CBC, bytes(16))
+    message = unpad(cipher.decrypt(payload), 16, style="pkcs7")[2:]
+    return json.loads(message.decode("ascii"), object_pairs_hook=OrderedDict)
+
+
+def encode_with_strings(values):
+    data = pad(bytearray("AA" + json.dumps(values), "ascii"), 16, style="pkcs7")
+    cipher = AES.new(SESSION_KEY, AES.MODE_CBC, bytes(16))
+    return base64.b64encode(cipher.encrypt(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTTP payload coding")
+    parser.add_argument("-n", type=int, default=20000, help="messages per run")
+    args = parser.parse_args()
+
+    codec = HTTPCodec(SESSION_KEY)
+    body = encode_with_strings(STATUS)
+    buffer = bytearray(4096)
+    buffer[: len(body)] = body
+    view = memoryview(buffer)[: len(body)]
+
+    def run(function, argument):
+        for _ in range(args.n):
+            function(argument)
+
+    for name, function, argument in [
+        ("decode strings", decode_with_strings, body),
+        ("decode codec", codec.decode, view),
+        ("encode strings", encode_with_strings, STATUS),
+        ("encode codec", codec.encode, STATUS),
+    ]:
+        elapsed = min(
+            timeit.repeat(lambda: run(function, argument), number=1, repeat=3)
+        )
+        print(
+            "{:16} {:8.2f} us/message {:10.0f} messages/s".format(
+                name, elapsed / args.n * 1e6, args.n / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,41 @@
 #!/usr/bin/env python3
 
 import argparse
+import contextlib
+import http.client
 import sys
 import pprint
 import urllib.error
 
-from pyairctrl.status_transformer import STATUS_TRANSFORMER
-from pyairctrl.coap_client import CoAPAirClient
-from pyairctrl.http_client import HTTPAirClient
-from pyairctrl.plain_coap_client import PlainCoAPAirClient
+from pyairctrl.output import FORMATS, RecordingOutput, TextOutput, create_output
+from pyairctrl import coap_discovery
+from pyairctrl.daemon import (
+    DEFAULT_SOCKET,
+    DaemonAirClient,
+    DaemonError,
+    connect_daemon,
+    serve,
+)
+from pyairctrl.delta import parse_deadbands
+from pyairctrl.keystore import default_keystore
+
+# The device client stacks take most of the start-up time. They are imported
+# where a client is created, so commands sent through the daemon skip them.
 
 
 class CliBase:
-    def __init__(self, client):
+    def __init__(self, client, host=None, output=None):
         self._client = client
+        self._host = host
+        self._output = output or TextOutput()
 
     def _dump_keys(self, status, subset, printKey):
-        for key in status:
-            current_value = status[key]
-            name_and_value = self._get_info_for_key(key, current_value, subset)
-            if name_and_value is None:
-                continue
-
-            prefix = "[{key}]\t".format(key=key) if printKey else ""
-            print(
-                "{prefix}{name_and_value}".format(
-                    prefix=prefix, name_and_value=name_and_value
-                ).expandtabs(30)
-            )
+        self._output.write_status(self._host, status, subset, printKey)
 
     def get_status(self, debug=False):
         status = self._client.get_status(debug)
         if status is None:
-            print("No info found")
+            self._output.write_message(self._host, "No info found")
             return
 
         if debug:
@@ -46,27 +49,10 @@ class CliBase:
         except urllib.error.HTTPError as e:
             print("Error setting values (response code: {})".format(e.code))
 
-    def _get_info_for_key(self, key, current_value, subset):
-        if key in STATUS_TRANSFORMER:
-            info = STATUS_TRANSFORMER[key]
-            if not subset is None and subset != info[1]:
-                return None
-
-            if not info[2] is None:
-                current_value = info[2](current_value)
-                if current_value is None:
-                    return None
-            return info[0].format(current_value)
-        else:
-            if not subset is None:
-                return None
-
-        return "{}: {}".format(key, current_value)
-
     def get_filters(self):
         status = self._client.get_filters()
         if status is None:
-            print("No filter-info found")
+            self._output.write_message(self._host, "No filter-info found")
             return
 
         self._dump_keys(status, "filter", False)
@@ -74,15 +60,15 @@ class CliBase:
     def get_firmware(self):
         status = self._client.get_firmware()
         if status is None:
-            print("No firmware-info found")
+            self._output.write_message(self._host, "No firmware-info found")
             return
 
         self._dump_keys(status, "firmware", False)
 
 
 class CoAPCliBase(CliBase):
-    def __init__(self, client):
-        super().__init__(client)
+    def __init__(self, client, host=None, output=None):
+        super().__init__(client, host, output)
 
     def get_wifi(self):
         print(
@@ -96,25 +82,55 @@ class CoAPCliBase(CliBase):
 
 
 class CoAPCli(CoAPCliBase):
-    def __init__(self, host, port=5683, debug=False):
-        super().__init__(CoAPAirClient(host, port, debug))
+    @staticmethod
+    def discover(protocol, network=None, debug=False):
+        network = network or coap_discovery.local_network()
+        # only plain CoAP devices need the hello and the status probe
+        response = coap_discovery.discover(network, hello=(protocol == "plain_coap"))
+        if debug:
+            pprint.pprint(response)
+        return [device for device in response if device["protocol"] == protocol]
+
+    def __init__(self, host, port=5683, debug=False, output=None, client=None):
+        if client is None:
+            from pyairctrl.coap_client import CoAPAirClient
+
+            client = CoAPAirClient(host, port, debug)
+        super().__init__(client, host, output)
 
 
 class PlainCoAPAirCli(CoAPCliBase):
-    def __init__(self, host, port=5683):
-        super().__init__(PlainCoAPAirClient(host, port))
+    def __init__(self, host, port=5683, output=None, client=None):
+        if client is None:
+            from pyairctrl.plain_coap_client import PlainCoAPAirClient
+
+            client = PlainCoAPAirClient(host, port)
+        super().__init__(client, host, output)
 
 
 class HTTPAirCli(CliBase):
     @staticmethod
     def ssdp(timeout=1, repeats=3, debug=False):
+        from pyairctrl.http_client import HTTPAirClient
+
         response = HTTPAirClient.ssdp(timeout, repeats)
         if debug:
             pprint.pprint(response)
         return response
 
-    def __init__(self, host, debug=True):
-        super().__init__(HTTPAirClient(host, debug))
+    @staticmethod
+    def discover(registry, refresh=False, debug=False):
+        response = registry.lookup(refresh)
+        if debug:
+            pprint.pprint(response)
+        return response
+
+    def __init__(self, host, debug=False, output=None, client=None):
+        if client is None:
+            from pyairctrl.http_client import HTTPAirClient
+
+            client = HTTPAirClient(host, debug, optimistic=True)
+        super().__init__(client, host, output)
 
     def set_wifi(self, ssid, pwd):
         values = {}
@@ -136,7 +152,125 @@ class HTTPAirCli(CliBase):
         self._dump_keys(firmware, None, False)
 
 
+class FleetCli(CliBase):
+    def __init__(
+        self, hosts, protocol="http", concurrency=32, deadline=10.0, output=None
+    ):
+        from pyairctrl.fleet import FleetPoller
+
+        super().__init__(
+            FleetPoller(hosts, protocol, concurrency, deadline),
+            output=output or TextOutput(show_host=True),
+        )
+
+    def get_status(self, debug=False):
+        self._run(self._print_results(debug))
+
+    def watch_changes(self, interval=10.0, deadbands=None):
+        """Poll until interrupted and only print the keys which changed."""
+        try:
+            self._run(self._print_changes(interval, deadbands))
+        except KeyboardInterrupt:
+            pass
+
+    def _run(self, coroutine):
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(coroutine)
+        finally:
+            self._client.close()
+            loop.close()
+
+    def warm_keys(self):
+        from pyairctrl.fleet import warm_keys
+
+        poller = self._client
+        results = warm_keys(poller.hosts, poller.concurrency, deadline=poller.deadline)
+        for result in results:
+            if result.error is not None:
+                error = str(result.error) or type(result.error).__name__
+                print("[{}] Error: {}".format(result.host, error))
+            else:
+                print(
+                    "[{}] Key exchanged in {:.3f} s".format(result.host, result.elapsed)
+                )
+
+    async def _print_results(self, debug):
+        async for result in self._client.poll():
+            if result.error is not None:
+                error = str(result.error) or type(result.error).__name__
+                self._output.write_error(result.host, error)
+            elif not result.status:
+                self._output.write_message(result.host, "No info found")
+            else:
+                if debug:
+                    pprint.pprint(result.status.to_dict())
+                self._output.write_status(result.host, result.status)
+
+    async def _print_changes(self, interval, deadbands):
+        async for result in self._client.poll_changes(interval, deadbands):
+            if result.error is not None:
+                error = str(result.error) or type(result.error).__name__
+                self._output.write_error(result.host, error)
+            else:
+                self._output.write_status(result.host, result.status)
+
+
+def _run_command(c, args):
+    if args.wifi:
+        c.get_wifi()
+        sys.exit(0)
+    if args.firmware:
+        c.get_firmware()
+        sys.exit(0)
+    if args.wifi_ssid or args.wifi_pwd:
+        c.set_wifi(args.wifi_ssid, args.wifi_pwd)
+        sys.exit(0)
+    if args.filters:
+        c.get_filters()
+        sys.exit(0)
+
+    values = {}
+    if args.om:
+        values["om"] = args.om
+    if args.pwr:
+        values["pwr"] = args.pwr
+    if args.mode:
+        values["mode"] = args.mode
+    if args.rhset:
+        values["rhset"] = int(args.rhset)
+    if args.func:
+        values["func"] = args.func
+    if args.aqil:
+        values["aqil"] = int(args.aqil)
+    if args.ddp:
+        values["ddp"] = args.ddp
+    if args.uil:
+        values["uil"] = args.uil
+    if args.dt:
+        values["dt"] = int(args.dt)
+    if args.cl:
+        values["cl"] = args.cl == "True"
+
+    if values:
+        c.set_values(values, debug=args.debug)
+    else:
+        c.get_status(debug=args.debug)
+
+
+def _device_registry(ttl):
+    from pyairctrl.registry import DeviceRegistry
+
+    return DeviceRegistry(default_keystore(), ttl)
+
+
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--ipaddr", help="IP address of air purifier")
     parser.add_argument(
@@ -145,6 +279,80 @@ def main():
         choices=["http", "coap", "plain_coap"],
         default="http",
     )
+    parser.add_argument(
+        "--hosts-file", help="poll the status of all devices listed in the file"
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="number of devices polled at once with --hosts-file",
+        type=int,
+        default=32,
+    )
+    parser.add_argument(
+        "--deadline",
+        help="seconds to wait for each device with --hosts-file",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--warm-keys",
+        help="exchange new session keys with all devices at once (HTTP only)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--changes-only",
+        help="keep polling and only print the values which changed",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--interval",
+        help="seconds between polls with --changes-only",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--deadband",
+        help="ignore changes of a numeric value below DELTA with --changes-only",
+        metavar="KEY=DELTA",
+        action="append",
+    )
+    parser.add_argument(
+        "--format",
+        help="output format of status, filters and firmware",
+        choices=FORMATS,
+        default="text",
+    )
+    parser.add_argument(
+        "--record",
+        help="append the numeric readings of every status to segment files in DIR",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--subnet",
+        help="network searched for CoAP devices without --ipaddr (default: local /24)",
+        metavar="CIDR",
+    )
+    parser.add_argument(
+        "--discovery-ttl",
+        help="seconds for which autodetected devices are remembered",
+        type=float,
+        default=3600.0,
+    )
+    parser.add_argument(
+        "--rediscover",
+        help="autodetect devices even when remembered ones are still fresh",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--socket",
+        help="send single device commands through the daemon listening here",
+        default=DEFAULT_SOCKET,
+    )
+    parser.add_argument(
+        "--no-daemon",
+        help="talk to the device directly even when the daemon is running",
+        action="store_true",
+    )
     parser.add_argument("-d", "--debug", help="show debug output", action="store_true")
     parser.add_argument(
         "--om", help="set fan speed", choices=["1", "2", "3", "s", "t", "a"]
@@ -180,70 +388,117 @@ def main():
     parser.add_argument("--firmware", help="read firmware", action="store_true")
     parser.add_argument("--filters", help="read filters status", action="store_true")
     args = parser.parse_args()
-
-    if args.ipaddr:
-        devices = [{"ip": args.ipaddr}]
-    else:
-        if args.protocol in ["coap", "plain_coap"]:
-            print(
-                "Autodetection is not supported when using CoAP. Use --ipaddr to set an IP address."
-            )
+    try:
+        deadbands = parse_deadbands(args.deadband)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.record and args.changes_only:
+        parser.error("--record needs full statuses and cannot use --changes-only")
+
+    if args.warm_keys:
+        if args.protocol != "http":
+            print("Session keys are only used when using HTTP.")
             sys.exit(1)
+        if args.hosts_file:
+            from pyairctrl.fleet import read_hosts_file
 
-        devices = HTTPAirCli.ssdp(debug=args.debug)
-        if not devices:
-            print(
-                "Air purifier not autodetected. Try --ipaddr option to force specific IP address."
+            hosts = read_hosts_file(args.hosts_file)
+        elif args.ipaddr:
+            hosts = [args.ipaddr]
+        else:
+            registry = _device_registry(args.discovery_ttl)
+            devices = HTTPAirCli.discover(registry, args.rediscover, args.debug)
+            hosts = [device["ip"] for device in devices]
+        FleetCli(hosts, args.protocol, args.concurrency, args.deadline).warm_keys()
+        sys.exit(0)
+
+    show_host = bool(args.hosts_file or args.changes_only)
+    output = create_output(args.format, sys.stdout, show_host=show_host)
+    if args.record:
+        from pyairctrl.recorder import Recorder
+
+        output = RecordingOutput(output, Recorder(args.record))
+    diagnostics = contextlib.ExitStack()
+    if args.format != "text":
+        # only the structured output goes to stdout, so it stays parseable
+        diagnostics.enter_context(contextlib.redirect_stdout(sys.stderr))
+    try:
+        if args.hosts_file:
+            from pyairctrl.fleet import read_hosts_file
+
+            hosts = read_hosts_file(args.hosts_file)
+            c = FleetCli(
+                hosts, args.protocol, args.concurrency, args.deadline, output
             )
-            sys.exit(1)
-
-    for device in devices:
-        if args.protocol == "http":
-            c = HTTPAirCli(device["ip"])
-        elif args.protocol == "plain_coap":
-            c = PlainCoAPAirCli(device["ip"])
-        elif args.protocol == "coap":
-            c = CoAPCli(device["ip"], debug=args.debug)
-
-        if args.wifi:
-            c.get_wifi()
-            sys.exit(0)
-        if args.firmware:
-            c.get_firmware()
-            sys.exit(0)
-        if args.wifi_ssid or args.wifi_pwd:
-            c.set_wifi(args.wifi_ssid, args.wifi_pwd)
-            sys.exit(0)
-        if args.filters:
-            c.get_filters()
+            if args.changes_only:
+                c.watch_changes(args.interval, deadbands)
+            else:
+                c.get_status(debug=args.debug)
             sys.exit(0)
 
-        values = {}
-        if args.om:
-            values["om"] = args.om
-        if args.pwr:
-            values["pwr"] = args.pwr
-        if args.mode:
-            values["mode"] = args.mode
-        if args.rhset:
-            values["rhset"] = int(args.rhset)
-        if args.func:
-            values["func"] = args.func
-        if args.aqil:
-            values["aqil"] = int(args.aqil)
-        if args.ddp:
-            values["ddp"] = args.ddp
-        if args.uil:
-            values["uil"] = args.uil
-        if args.dt:
-            values["dt"] = int(args.dt)
-        if args.cl:
-            values["cl"] = args.cl == "True"
-
-        if values:
-            c.set_values(values, debug=args.debug)
+        # devices remembered from an earlier discovery may have moved
+        remembered = False
+        if args.ipaddr:
+            devices = [{"ip": args.ipaddr}]
         else:
-            c.get_status(debug=args.debug)
+            if args.protocol in ["coap", "plain_coap"]:
+                devices = CoAPCli.discover(args.protocol, args.subnet, args.debug)
+            else:
+                registry = _device_registry(args.discovery_ttl)
+                remembered = not args.rediscover and bool(registry.devices())
+                devices = HTTPAirCli.discover(registry, args.rediscover, args.debug)
+            if not devices:
+                print(
+                    "Air purifier not autodetected. Try --ipaddr option to force specific IP address."
+                )
+                sys.exit(1)
+
+        if args.changes_only:
+            hosts = [device["ip"] for device in devices]
+            c = FleetCli(
+                hosts, args.protocol, args.concurrency, args.deadline, output
+            )
+            c.watch_changes(args.interval, deadbands)
+            sys.exit(0)
+
+        daemon = None if args.no_daemon else connect_daemon(args.socket)
+        handled = set()
+        while devices:
+            device = devices.pop(0)
+            handled.add(device["ip"])
+            client = None
+            if daemon is not None:
+                client = DaemonAirClient(daemon, device["ip"], args.protocol)
+            try:
+                if args.protocol == "http":
+                    c = HTTPAirCli(
+                        device["ip"], debug=args.debug, output=output, client=client
+                    )
+                elif args.protocol == "plain_coap":
+                    c = PlainCoAPAirCli(device["ip"], output=output, client=client)
+                elif args.protocol == "coap":
+                    c = CoAPCli(
+                        device["ip"], debug=args.debug, output=output, client=client
+                    )
+                _run_command(c, args)
+            except (OSError, http.client.HTTPException):
+                if not remembered:
+                    raise
+                # search once and go on with the devices which were not tried yet
+                remembered = False
+                print("{} did not answer, searching again ...".format(device["ip"]))
+                found = registry.refresh()
+                if device["ip"] not in [d["ip"] for d in found]:
+                    registry.remove(device["ip"])
+                devices = [d for d in found if d["ip"] not in handled]
+                if not devices:
+                    raise
+    except DaemonError as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+    finally:
+        output.close()
+        diagnostics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,326 @@
+"""Asyncio CoAP Air Client."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import asyncio
+import binascii
+import os
+import random
+from collections import OrderedDict
+
+from coapthon import defines
+from coapthon.messages.message import Message
+from coapthon.messages.request import Request
+from coapthon.serializer import Serializer
+from coapthon.utils import generate_random_token
+
+from pyairctrl.coap_client import EncryptedCoAPClientBase
+from pyairctrl.coap_codec import CoAPCodec, WrongDigestException
+from pyairctrl.snapshot_cache import SnapshotCache
+from pyairctrl.write_batching import WriteBatching
+
+
+class CoAPProtocol(asyncio.DatagramProtocol):
+    """CoAP endpoint running on the event loop instead of a receiver thread.
+
+    Incoming messages are dispatched by token to the registered handlers,
+    confirmable messages are acknowledged and messages nobody waits for are
+    rejected with RST, which also cancels stale observations on the device.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self._mid = random.randint(1, 65535)
+        self._handlers = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        message = Serializer.deserialize(data, addr)
+        if not isinstance(message, Message):
+            return
+        if message.code == defines.Codes.EMPTY.number:
+            return
+
+        handler = self._handlers.get(message.token)
+        if handler is None:
+            if message.type != defines.Types["ACK"]:
+                self._send_empty(message.mid, defines.Types["RST"])
+            return
+
+        if message.type == defines.Types["CON"]:
+            self._send_empty(message.mid, defines.Types["ACK"])
+        handler(message)
+
+    def error_received(self, exc):
+        self._fail_all(exc)
+
+    def connection_lost(self, exc):
+        self._fail_all(exc or ConnectionError("CoAP endpoint closed"))
+
+    def _fail_all(self, exc):
+        for handler in list(self._handlers.values()):
+            handler(exc)
+
+    def _next_mid(self):
+        self._mid = (self._mid + 1) % (1 << 16)
+        return self._mid
+
+    def _send_empty(self, mid, message_type):
+        message = Message()
+        message.type = message_type
+        message.mid = mid
+        message.code = defines.Codes.EMPTY.number
+        self.send(message)
+
+    def send(self, message):
+        if message.mid is None:
+            message.mid = self._next_mid()
+        self.transport.sendto(Serializer.serialize(message).raw)
+
+    def register(self, token, handler):
+        self._handlers[token] = handler
+
+    def unregister(self, token):
+        self._handlers.pop(token, None)
+
+    async def request(self, request, timeout, on_notification=None):
+        """Send a request and wait for its response.
+
+        With ``on_notification`` the token stays registered after the first
+        response and every later notification for it is passed to the
+        callback until the caller unregisters the token.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def on_message(message):
+            if future.done():
+                if on_notification is not None:
+                    on_notification(message)
+                return
+            if isinstance(message, Exception):
+                future.set_exception(message)
+            else:
+                future.set_result(message)
+
+        request.mid = self._next_mid()
+        # block-wise transfers of notifications reuse the observe token
+        previous = self._handlers.get(request.token)
+        self.register(request.token, on_message)
+        try:
+            deadline = loop.time() + timeout
+            ack_timeout = defines.ACK_TIMEOUT
+            while True:
+                self.send(request)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.shield(future), min(ack_timeout, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    if loop.time() >= deadline:
+                        raise
+                    # retransmit with exponential back-off like coapthon does
+                    ack_timeout *= 2
+        finally:
+            if previous is not None:
+                self.register(request.token, previous)
+            elif on_notification is None or not future.done() or future.exception():
+                self.unregister(request.token)
+
+
+class AsyncCoAPAirClient(EncryptedCoAPClientBase):
+    """CoAP client for encrypted devices which runs on an asyncio event loop.
+
+    Every client only owns a UDP endpoint, so a single loop can drive
+    hundreds of devices at once:
+
+        async with AsyncCoAPAirClient(host) as client:
+            status = await client.get_status()
+
+    ``snapshot_ttl`` and ``invalidate_on_set`` work as for CoAPAirClient.
+    """
+
+    def __init__(
+        self,
+        host,
+        port=5683,
+        debug=False,
+        timeout=30.0,
+        snapshot_ttl=0.0,
+        invalidate_on_set=False,
+    ):
+        self.server = host
+        self.port = port
+        self.debug = debug
+        self.timeout = timeout
+        self.client_key = None
+        self._codec = CoAPCodec()
+        self._batching = WriteBatching()
+        self._snapshot = SnapshotCache(snapshot_ttl, invalidate_on_set)
+        self._transport = None
+        self._protocol = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def connect(self):
+        loop = asyncio.get_event_loop()
+        self._transport, self._protocol = await loop.create_datagram_endpoint(
+            CoAPProtocol, remote_addr=(self.server, self.port)
+        )
+        try:
+            await self._sync()
+        except BaseException:
+            # also on cancellation, e.g. by asyncio.wait_for
+            self.close()
+            raise
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def _mk_request(self, method, path, payload=None):
+        request = Request()
+        request.destination = (self.server, self.port)
+        request.type = defines.Types["CON"]
+        request.code = method.number
+        request.uri_path = path
+        request.token = generate_random_token(4)
+        if payload is not None:
+            request.payload = payload
+        return request
+
+    async def _request(self, method, path, payload=None, observe=None):
+        request = self._mk_request(method, path, payload)
+        if observe is not None:
+            request.observe = observe
+        response = await self._protocol.request(request, self.timeout)
+        return await self._complete_blocks(method, path, response)
+
+    async def _complete_blocks(self, method, path, response):
+        # fetch the remaining blocks of a large status document
+        block2 = response.block2
+        payload = response.payload
+        while block2 is not None and block2[1]:
+            num, _, size = block2
+            request = self._mk_request(method, path)
+            request.token = response.token
+            request.block2 = (num + 1, 0, size)
+            block = await self._protocol.request(request, self.timeout)
+            payload += block.payload
+            block2 = block.block2
+        response.payload = payload
+        return response
+
+    async def _sync(self):
+        self.syncrequest = binascii.hexlify(os.urandom(4)).decode("utf8").upper()
+        try:
+            response = await self._request(
+                defines.Codes.POST, "/sys/dev/sync", self.syncrequest
+            )
+        except (asyncio.TimeoutError, OSError):
+            self.close()
+            raise Exception("sync timeout")
+        self.client_key = response.payload
+
+    async def _get(self):
+        path = "/sys/dev/status"
+        decrypted_payload = None
+
+        try:
+            response = await self._request(defines.Codes.GET, path, observe=0)
+            decrypted_payload = self._decrypt_payload(response.payload)
+        except WrongDigestException:
+            print("Message from device got corrupted")
+        except Exception as e:
+            print("Unexpected error:{}".format(e))
+
+        if decrypted_payload is not None:
+            return self._parse_status(decrypted_payload)
+        else:
+            return {}
+
+    async def observe_status(self):
+        """Yield the reported status every time the device pushes an update."""
+        path = "/sys/dev/status"
+        notifications = asyncio.Queue()
+        request = self._mk_request(defines.Codes.GET, path)
+        request.observe = 0
+        try:
+            response = await self._protocol.request(
+                request, self.timeout, notifications.put_nowait
+            )
+            while True:
+                response = await self._complete_blocks(defines.Codes.GET, path, response)
+                try:
+                    yield self._parse_status(self._decrypt_payload(response.payload))
+                except WrongDigestException:
+                    print("Message from device got corrupted")
+                response = await notifications.get()
+                if isinstance(response, Exception):
+                    raise response
+        finally:
+            # the next notification is answered with RST which ends the observation
+            self._protocol.unregister(request.token)
+
+    async def _set(self, key, value):
+        return await self._set_many({key: value})
+
+    async def _set_many(self, values):
+        path = "/sys/dev/control"
+        try:
+            payload = self._create_control_payload(values)
+            encrypted_payload = self._encrypt_payload(payload)
+            response = await self._request(defines.Codes.POST, path, encrypted_payload)
+            if self.debug:
+                print(response)
+            return response.payload == '{"status":"success"}'
+        except Exception as e:
+            print("Unexpected error:{}".format(e))
+            # no answer, which WriteBatching tells apart from a rejection
+            return None
+
+    async def _get_snapshot(self):
+        status = self._snapshot.lookup()
+        if status is None:
+            status = self._snapshot.store(await self._get())
+        return status
+
+    async def get_status(self):
+        return await self._get_snapshot()
+
+    async def set_values(self, values):
+        results = await self.set_values_batch(values)
+        return all(results.values())
+
+    async def set_values_batch(self, values):
+        """Async counterpart of CoAPAirClient.set_values_batch."""
+        try:
+            batch = None
+            if self._batching.should_batch(values):
+                batch = await self._set_many(values)
+                if self._batching.batch_written(batch):
+                    return OrderedDict((key, True) for key in values)
+            results = OrderedDict()
+            for key in values:
+                results[key] = bool(await self._set(key, values[key]))
+            self._batching.keys_written(batch, results)
+            return results
+        finally:
+            self._snapshot.values_set()
+
+    async def get_firmware(self):
+        return await self._get_snapshot()
+
+    async def get_filters(self):
+        return await self._get_snapshot()
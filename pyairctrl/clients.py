@@ -0,0 +1,30 @@
+"""Device clients."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+PROTOCOLS = ["http", "coap", "plain_coap"]
+
+
+def create_client(protocol, host, transport=None, deadline=10.0):
+    """Return a client for ``host`` which is kept for many requests.
+
+    HTTP clients send through ``transport`` and skip the key check until a
+    request fails, CoAP clients wait ``deadline`` seconds for an answer and
+    plain CoAP clients keep their session open. The client stacks are only
+    imported when a client is created, so importing this module is cheap.
+    """
+    if protocol == "http":
+        from pyairctrl.http_client import HTTPAirClient
+
+        return HTTPAirClient(host, transport=transport, optimistic=True)
+    if protocol == "coap":
+        from pyairctrl.coap_client import CoAPAirClient
+
+        return CoAPAirClient(host, timeout=deadline)
+    if protocol == "plain_coap":
+        from pyairctrl.plain_coap_client import PlainCoAPAirClient
+
+        client = PlainCoAPAirClient(host)
+        client.open_session()
+        return client
+    raise ValueError("Unknown protocol: {}".format(protocol))
@@ -1,18 +1,18 @@
 #!/usr/bin/env python3
 import os
 import re
-import json
 import email
 import struct
 import base64
 import hashlib
 import binascii
 import argparse
-import configparser
 import urllib.request
 import urllib.parse
 
+from pyairctrl import json_codec
 from pyairctrl.http_client import HTTPAirClient
+from pyairctrl.keystore import default_keystore
 
 def parse_attr(str, key):
     p = re.compile('%s=\"(.+?)\"' % key)
@@ -22,9 +22,10 @@ def parse_attr(str, key):
 
 class CloudClient:
 
-    def __init__(self, device_id, debug=False):
+    def __init__(self, device_id, debug=False, keystore=None):
         self._device_id = device_id
         self._debug = debug
+        self._keystore = keystore or default_keystore()
 
     def _login(self):
         print('Logging in with {}'.format(self._client_id))
@@ -43,7 +44,7 @@ class CloudClient:
                              'content': {'type': 0, 'data': '{\"pageSize\":4}'},
                              'attachResponse': True}]
 
-        req = urllib.request.Request(url=url, data=json.dumps(req_body).encode('ascii'), method='POST')
+        req = urllib.request.Request(url=url, data=json_codec.dumps(req_body).encode('ascii'), method='POST')
         req.add_header('Authorization', auth)
         req.add_header('Content-Type', 'application/CB-Message; encoding=JSON')
         with urllib.request.urlopen(req) as response:
@@ -91,10 +92,10 @@ class CloudClient:
         req_body['body'] = [{'action': {'name': 'ProvisionRequest', 'version': 1},
                              'requestNr': 1,
                              'errorCode': 0,
-                             'content': {'type': 0, 'data': json.dumps(body_data)},
+                             'content': {'type': 0, 'data': json_codec.dumps(body_data)},
                              'attachResponse': True}]
 
-        req = urllib.request.Request(url=url, data=json.dumps(req_body).encode('ascii'), method='POST')
+        req = urllib.request.Request(url=url, data=json_codec.dumps(req_body).encode('ascii'), method='POST')
         req.add_header('Authorization', auth)
         req.add_header('Content-Type', 'application/CB-Message; encoding=JSON')
         with urllib.request.urlopen(req) as response:
@@ -110,41 +111,28 @@ class CloudClient:
         for part in msg.get_payload():
             if part.get_content_type() == 'application/cb-message':
                 continue
-            p = json.loads(part.get_payload(decode=False))
+            p = json_codec.loads(part.get_payload(decode=False))
             client_id, client_key = p['ClientId'], p['Key']
             bytes_key = bytes.fromhex(client_key)
             client_key = base64.b64encode(bytes_key).decode('ascii')
 
         print('Client id: {}'.format(client_id))
         print('Client key: {}'.format(client_key))
-        config = configparser.ConfigParser()
-        fpath = os.path.expanduser('~/.pyairctrl')
-        config.read(fpath)
-        if 'cloud' not in config.sections():
-            config['cloud'] = {}
-        config['cloud']['client_id'] = client_id
-        config['cloud']['client_key'] = client_key
+        self._keystore.set_many('cloud', {'client_id': client_id, 'client_key': client_key})
         self._client_id = client_id
         self._client_key = client_key
-        with open(fpath, 'w') as f:
-            config.write(f)
 
     def load_credentials(self):
-        fpath = os.path.expanduser('~/.pyairctrl')
-        if os.path.isfile(fpath):
-            config = configparser.ConfigParser()
-            config.read(fpath)
-            if 'cloud' in config and 'client_id' in config['cloud']:
-                self._client_id = config['cloud']['client_id']
-                self._client_key = config['cloud']['client_key']
-            else:
-                self._create_account()
+        client_id = self._keystore.get('cloud', 'client_id')
+        if client_id is not None:
+            self._client_id = client_id
+            self._client_key = self._keystore.get('cloud', 'client_key')
         else:
             self._create_account()
 
     def _multi_part(self, part1, part2):
-        part1_str = json.dumps(part1).replace(' ', '')
-        part2_str = json.dumps(part2).replace(' ', '')
+        part1_str = json_codec.dumps(part1).replace(' ', '')
+        part2_str = json_codec.dumps(part2).replace(' ', '')
         result = "--ICPMimeBoundary\r\n"
         result += "Content-Type: application/CB-Message; encoding=JSON\r\n"
         result += "Content-Length: " + str(len(part1_str)).zfill(10) + "\r\n\r\n"
@@ -186,7 +174,7 @@ class CloudClient:
                           'replyTo': self._client_id,
                           'conversationId': '',
                           'serviceTag': '',
-                          'data': json.dumps(part2_data),
+                          'data': json_codec.dumps(part2_data),
                           'action': 'PUTPROPS'}
         part2['targets'] = [self._device_id]
         part2['ttl'] = 5
@@ -253,7 +241,7 @@ class CloudClient:
         for part in msg.get_payload():
             if part.get_content_type() == 'application/cb-message':
                 continue
-            p = json.loads(part.get_payload(decode=False))
+            p = json_codec.loads(part.get_payload(decode=False))
             rel_status = p['RelationshipStatus']
             print('Relationship status: {}'.format(rel_status))
 
@@ -3,21 +3,18 @@
 # pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
 
 import binascii
-import hashlib
-import json
 import logging
 import os
+import queue
 from abc import ABC, abstractmethod
-from collections import OrderedDict
 
 from coapthon import defines
 from coapthon.client.helperclient import HelperClient
-from Cryptodome.Cipher import AES
-from Cryptodome.Util.Padding import pad, unpad
 
-
-class WrongDigestException(Exception):
-    pass
+from pyairctrl import json_codec
+from pyairctrl.coap_codec import CoAPCodec, WrongDigestException
+from pyairctrl.snapshot_cache import SnapshotCache
+from pyairctrl.write_batching import WriteBatching
 
 
 class NotSupportedException(Exception):
@@ -25,28 +22,46 @@ class NotSupportedException(Exception):
 
 
 class HTTPAirClientBase(ABC):
-    def __init__(self, host, port, debug=False):
+    def __init__(
+        self, host, port, debug=False, snapshot_ttl=0.0, invalidate_on_set=False
+    ):
+        """Create a client for the device at ``host``.
+
+        With a ``snapshot_ttl`` above 0 status, filters and firmware are
+        served from one fetched status document for that many seconds. With
+        ``invalidate_on_set`` the first read after set_values fetches again.
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel("WARN")
         self.server = host
         self.port = port
         self.debug = debug
+        self._batching = WriteBatching()
+        self._snapshot = SnapshotCache(snapshot_ttl, invalidate_on_set)
 
     def get_status(self, debug=False):
         if debug:
             self.logger.setLevel("DEBUG")
-        status = self._get()
+        status = self._snapshot.get(self._get)
         return status
 
     def set_values(self, values, debug=False):
         if debug:
             self.logger.setLevel("DEBUG")
 
-        result = True
-        for key in values:
-            result = result and self._set(key, values[key])
+        results = self.set_values_batch(values)
+        return all(results.values())
+
+    def set_values_batch(self, values):
+        """Apply all values with a single write if the device accepts it.
 
-        return result
+        Falls back to one write per key when the multi-key write fails and
+        returns whether each key was applied.
+        """
+        try:
+            return self._batching.write(values, self._set_many, self._set)
+        finally:
+            self._snapshot.values_set()
 
     @abstractmethod
     def _get(self):
@@ -56,12 +71,15 @@ class HTTPAirClientBase(ABC):
     def _set(self, key, value):
         pass
 
+    def _set_many(self, values):
+        return False
+
     def get_firmware(self):
-        status = self._get()
+        status = self._snapshot.get(self._get)
         return status
 
     def get_filters(self):
-        status = self._get()
+        status = self._snapshot.get(self._get)
         return status
 
     def get_wifi(self):
@@ -71,11 +89,38 @@ class HTTPAirClientBase(ABC):
         raise NotSupportedException
 
 
-class CoAPAirClient(HTTPAirClientBase):
-    SECRET_KEY = "JiangPan"
+class EncryptedCoAPClientBase:
+    def _decrypt_payload(self, encrypted_payload):
+        return self._codec.decrypt(encrypted_payload)
+
+    def _encrypt_payload(self, payload):
+        self._update_client_key()
+        return self._codec.encrypt(self.client_key, payload)
+
+    def _update_client_key(self):
+        self.client_key = "{:x}".format(int(self.client_key, 16) + 1).upper()
 
-    def __init__(self, host, port=5683, debug=False, timeout=30.0):
-        super().__init__(host, port, debug)
+    def _parse_status(self, decrypted_payload):
+        return json_codec.loads(decrypted_payload)["state"]["reported"]
+
+    def _create_control_payload(self, values):
+        desired = {"CommandType": "app", "DeviceId": "", "EnduserId": ""}
+        desired.update(values)
+        return json_codec.dumps({"state": {"desired": desired}})
+
+
+class CoAPAirClient(HTTPAirClientBase, EncryptedCoAPClientBase):
+    def __init__(
+        self,
+        host,
+        port=5683,
+        debug=False,
+        timeout=30.0,
+        snapshot_ttl=0.0,
+        invalidate_on_set=False,
+    ):
+        super().__init__(host, port, debug, snapshot_ttl, invalidate_on_set)
+        self._codec = CoAPCodec()
         self.client = self._create_coap_client(self.server, self.port)
         self.timeout = timeout
         self.response = None
@@ -99,46 +144,6 @@ class CoAPAirClient(HTTPAirClientBase):
             self.client.stop()
             raise Exception("sync timeout")
 
-    def _decrypt_payload(self, encrypted_payload):
-        encoded_counter = encrypted_payload[0:8]
-        aes = self._handle_AES(encoded_counter)
-        encoded_message = encrypted_payload[8:-64].upper()
-        digest = encrypted_payload[-64:]
-        calculated_digest = self._create_digest(encoded_counter, encoded_message)
-        if digest != calculated_digest:
-            raise WrongDigestException
-        decoded_message = aes.decrypt(bytes.fromhex(encoded_message))
-        unpaded_message = unpad(decoded_message, 16, style="pkcs7")
-        return unpaded_message.decode("utf8")
-
-    def _encrypt_payload(self, payload):
-        self._update_client_key()
-        aes = self._handle_AES(self.client_key)
-        paded_message = pad(bytes(payload.encode("utf8")), 16, style="pkcs7")
-        encoded_message = binascii.hexlify(aes.encrypt(paded_message)).decode("utf8").upper()
-        digest = self._create_digest(self.client_key, encoded_message)
-        return self.client_key + encoded_message + digest
-
-    def _create_digest(self, id, encoded_message):
-        digest = (
-            hashlib.sha256(bytes((id + encoded_message).encode("utf8")))
-            .hexdigest()
-            .upper()
-        )
-        return digest
-
-    def _update_client_key(self):
-        self.client_key = "{:x}".format(int(self.client_key, 16) + 1).upper()
-
-    def _handle_AES(self, id):
-        key_and_iv = hashlib.md5((self.SECRET_KEY + id).encode()).hexdigest().upper()
-        half_keylen = len(key_and_iv) // 2
-        secret_key = key_and_iv[0:half_keylen]
-        iv = key_and_iv[half_keylen:]
-        return AES.new(
-            bytes(secret_key.encode("utf8")), AES.MODE_CBC, bytes(iv.encode("utf8"))
-        )
-
     def _get(self):
         path = "/sys/dev/status"
         decrypted_payload = None
@@ -155,29 +160,52 @@ class CoAPAirClient(HTTPAirClientBase):
             print("Unexpected error:{}".format(e))
 
         if decrypted_payload is not None:
-            return json.loads(decrypted_payload, object_pairs_hook=OrderedDict)[
-                "state"
-            ]["reported"]
+            return self._parse_status(decrypted_payload)
         else:
             return {}
 
+    def observe_status(self):
+        """Yield the reported status every time the device pushes an update.
+
+        The observation uses its own CoAP client, so the regular client stays
+        available for commands while the generator is consumed.
+        """
+        notifications = queue.Queue()
+        client = self._create_coap_client(self.server, self.port)
+        request = client.mk_request(defines.Codes.GET, "/sys/dev/status")
+        request.observe = 0
+        client.send_request(request, notifications.put)
+        response = None
+        try:
+            try:
+                response = notifications.get(timeout=self.timeout)
+            except queue.Empty:
+                raise Exception("observe timeout")
+            while response is not None:
+                try:
+                    yield self._parse_status(self._decrypt_payload(response.payload))
+                except WrongDigestException:
+                    print("Message from device got corrupted")
+                response = notifications.get()
+        finally:
+            if response is not None:
+                client.cancel_observing(response, True)
+            else:
+                client.stop()
+
     def _set(self, key, value):
+        return self._set_many({key: value})
+
+    def _set_many(self, values):
         path = "/sys/dev/control"
         try:
-            payload = {
-                "state": {
-                    "desired": {
-                        "CommandType": "app",
-                        "DeviceId": "",
-                        "EnduserId": "",
-                        key: value,
-                    }
-                }
-            }
-            encrypted_payload = self._encrypt_payload(json.dumps(payload))
+            payload = self._create_control_payload(values)
+            encrypted_payload = self._encrypt_payload(payload)
             response = self.client.post(path, encrypted_payload, timeout=self.timeout)
             if self.debug:
                 print(response)
             return response.payload == '{"status":"success"}'
         except Exception as e:
             print("Unexpected error:{}".format(e))
+            # no answer, which WriteBatching tells apart from a rejection
+            return None
@@ -0,0 +1,62 @@
+"""CoAP payload codec."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import binascii
+import hashlib
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad, unpad
+
+SECRET_KEY = b"JiangPan"
+
+
+class WrongDigestException(Exception):
+    pass
+
+
+def derive_key(counter):
+    """Return the AES key and IV for a counter given as ASCII bytes."""
+    key_and_iv = hashlib.md5(SECRET_KEY + counter).hexdigest().upper().encode("ascii")
+    return key_and_iv[:16], key_and_iv[16:]
+
+
+def create_digest(counter, encoded_message):
+    digest = hashlib.sha256(counter)
+    digest.update(encoded_message)
+    return digest.hexdigest().upper().encode("ascii")
+
+
+class CoAPCodec:
+    """Encrypts and decrypts the payloads of encrypted CoAP devices.
+
+    A payload is the 8 hex digit message counter, the AES-CBC encrypted
+    message as upper case hex and the SHA-256 digest of both. Payloads may be
+    given as str or bytes.
+    """
+
+    def decrypt(self, encrypted_payload):
+        if isinstance(encrypted_payload, str):
+            encrypted_payload = encrypted_payload.encode("ascii")
+        counter = encrypted_payload[0:8]
+        encoded_message = encrypted_payload[8:-64]
+        digest = encrypted_payload[-64:]
+        if not encoded_message.isupper():
+            # the digest is calculated over the upper case message
+            encoded_message = encoded_message.upper()
+        if digest.upper() != create_digest(counter, encoded_message):
+            raise WrongDigestException
+
+        key, iv = derive_key(counter)
+        aes = AES.new(key, AES.MODE_CBC, iv)
+        decoded_message = aes.decrypt(binascii.a2b_hex(encoded_message))
+        return unpad(decoded_message, 16, style="pkcs7").decode("utf8")
+
+    def encrypt(self, counter, payload):
+        counter_bytes = counter.encode("ascii")
+        key, iv = derive_key(counter_bytes)
+        aes = AES.new(key, AES.MODE_CBC, iv)
+        paded_message = pad(payload.encode("utf8"), 16, style="pkcs7")
+        encoded_message = binascii.hexlify(aes.encrypt(paded_message)).upper()
+        digest = create_digest(counter_bytes, encoded_message)
+        return counter + (encoded_message + digest).decode("ascii")
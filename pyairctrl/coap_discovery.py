@@ -0,0 +1,244 @@
+"""CoAP discovery."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import binascii
+import ipaddress
+import os
+import random
+import select
+import socket
+import struct
+import time
+from collections import deque
+
+from pyairctrl import json_codec
+
+COAP_PORT = 5683
+MAX_HOSTS = 65536
+# seconds between the last hello and the first status probe
+HELLO_DELAY = 0.1
+
+# message types and codes of RFC 7252
+CON, NON, ACK, RST = 0, 1, 2, 3
+GET, POST = 0x01, 0x02
+OBSERVE = 6
+URI_PATH = 11
+PAYLOAD_MARKER = 0xFF
+
+# what is sent to each host: encrypted devices answer the sync request with
+# their message counter, plain ones the status request after a hello
+HELLO = "hello"
+SYNC_PROBE = "sync"
+STATUS_PROBE = "status"
+
+
+def encode_request(
+    code, message_id, token, path, payload=b"", message_type=CON, observe=None
+):
+    header = struct.pack(
+        "!BBH", 0x40 | (message_type << 4) | len(token), code, message_id
+    )
+    options = []
+    number = 0
+    if observe is not None:
+        # options are sorted by number, Observe comes before Uri-Path
+        value = observe.to_bytes((observe.bit_length() + 7) // 8, "big")
+        options.append(bytes([(OBSERVE << 4) | len(value)]) + value)
+        number = OBSERVE
+    for segment in path.strip("/").split("/"):
+        segment = segment.encode("utf8")
+        # the Uri-Path option is repeated, its delta is 0 after the first one
+        delta, number = URI_PATH - number, URI_PATH
+        if len(segment) < 13:
+            options.append(bytes([(delta << 4) | len(segment)]) + segment)
+        else:
+            options.append(bytes([(delta << 4) | 13, len(segment) - 13]) + segment)
+    message = header + token + b"".join(options)
+    if payload:
+        message += bytes([PAYLOAD_MARKER]) + payload
+    return message
+
+
+def _skip_options(data, index):
+    """Return the index after the options starting at ``index``, None for garbage."""
+    try:
+        while index < len(data) and data[index] != PAYLOAD_MARKER:
+            delta, length = data[index] >> 4, data[index] & 0x0F
+            if delta == 15 or length == 15:
+                return None
+            # deltas and lengths above 12 are extended by one or two bytes
+            index += 1 + {13: 1, 14: 2}.get(delta, 0)
+            if length == 13:
+                length = data[index] + 13
+                index += 1
+            elif length == 14:
+                length = struct.unpack_from("!H", data, index)[0] + 269
+                index += 2
+            index += length
+    except (IndexError, struct.error):
+        return None
+    return index if index <= len(data) else None
+
+
+def decode_response(data):
+    """Return (type, code, message id, token, payload) or None for garbage."""
+    if len(data) < 4 or data[0] >> 6 != 1:
+        return None
+    message_type = (data[0] >> 4) & 0x03
+    token_length = data[0] & 0x0F
+    code, message_id = data[1], struct.unpack_from("!H", data, 2)[0]
+    if token_length > 8 or len(data) < 4 + token_length:
+        return None
+    token = data[4 : 4 + token_length]
+    end = _skip_options(data, 4 + token_length)
+    if end is None:
+        return None
+    return message_type, code, message_id, token, data[end + 1 :]
+
+
+def _is_counter(payload):
+    try:
+        return len(payload) == 8 and int(payload, 16) >= 0
+    except ValueError:
+        return False
+
+
+def _is_status(payload):
+    try:
+        return "reported" in json_codec.loads(payload)["state"]
+    except (ValueError, KeyError, TypeError):
+        return False
+
+
+def _send_hello(host, port):
+    # coapthon is only loaded when hellos are sent
+    from pyairctrl.plain_coap_client import PlainCoAPAirClient
+
+    try:
+        PlainCoAPAirClient(host, port).send_hello()
+    except OSError:
+        # e.g. no permission to open an ICMP socket
+        pass
+
+
+def _hosts(network):
+    network = ipaddress.ip_network(network, strict=False)
+    if network.num_addresses > MAX_HOSTS:
+        raise ValueError("{} has too many addresses to probe".format(network))
+    if network.num_addresses == 1:
+        return [str(network.network_address)]
+    return [str(host) for host in network.hosts()]
+
+
+def local_network(prefix=24):
+    """Return the /``prefix`` network of the interface used for the default route."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        # connecting a UDP socket sends nothing, it only selects the interface
+        s.connect(("192.0.2.1", COAP_PORT))
+        ip = s.getsockname()[0]
+    return str(ipaddress.ip_network("{}/{}".format(ip, prefix), strict=False))
+
+
+def discover(network, port=COAP_PORT, timeout=1.0, rate=200.0, hello=True):
+    """Probe every address of ``network`` for CoAP air purifiers.
+
+    All probes go out from one UDP socket, at most ``rate`` packets per
+    second, and answers are matched to hosts by their random token. Each
+    host gets a POST to /sys/dev/sync, which only devices with encrypted
+    CoAP answer with their message counter. With ``hello``, each host then
+    gets the hello of the plain CoAP client and, once all hellos are out, an
+    observing GET of /sys/dev/status, which only plain CoAP devices answer
+    with their status document; the observation is cancelled at once.
+    Answers are collected until ``timeout`` seconds after the last probe was
+    sent. Returns one dict per device with "ip" and "protocol" ("coap" or
+    "plain_coap"), other CoAP servers are left out.
+    """
+    hosts = _hosts(network)
+    probes = deque()
+    for host in hosts:
+        if hello:
+            probes.append((host, HELLO))
+        probes.append((host, SYNC_PROBE))
+    if hello:
+        probes.extend((host, STATUS_PROBE) for host in hosts)
+    ready = 0.0
+    answers = {}
+    tokens = {}
+    message_id = random.getrandbits(16)
+    interval = 1.0 / rate
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.setblocking(False)
+        next_send = time.monotonic()
+        deadline = next_send + timeout
+        while True:
+            now = time.monotonic()
+            if probes and now >= next_send:
+                host, kind = probes[0]
+                if kind == STATUS_PROBE and now < ready:
+                    # give the devices time to open their port after the hello
+                    next_send = ready
+                    continue
+                probes.popleft()
+                if kind == HELLO:
+                    _send_hello(host, port)
+                    ready = now + HELLO_DELAY
+                else:
+                    token = os.urandom(4)
+                    message_id = (message_id + 1) & 0xFFFF
+                    tokens[token] = (host, kind)
+                    if kind == SYNC_PROBE:
+                        counter = binascii.hexlify(os.urandom(4)).upper()
+                        message = encode_request(
+                            POST, message_id, token, "/sys/dev/sync", counter
+                        )
+                    else:
+                        message = encode_request(
+                            GET, message_id, token, "/sys/dev/status", observe=0
+                        )
+                    try:
+                        s.sendto(message, (host, port))
+                    except OSError:
+                        # e.g. the broadcast address of the network
+                        pass
+                next_send = max(next_send + interval, now)
+                deadline = now + timeout
+                continue
+            if not probes and now >= deadline:
+                break
+
+            wait = (next_send if probes else deadline) - now
+            readable, _, _ = select.select([s], [], [], max(wait, 0.0))
+            if not readable:
+                continue
+            try:
+                data, (ip, source_port) = s.recvfrom(2048)
+            except (BlockingIOError, ConnectionRefusedError):
+                continue
+            response = decode_response(data)
+            if response is None:
+                continue
+            message_type, code, response_id, token, payload = response
+            probe = tokens.get(token)
+            if probe is None or probe[0] != ip:
+                continue
+            if probe[1] == STATUS_PROBE:
+                # a reset ends the observation, as the plain client does it
+                s.sendto(struct.pack("!BBH", 0x70, 0, response_id), (ip, source_port))
+            elif message_type == CON:
+                # a separate response has to be acknowledged
+                s.sendto(struct.pack("!BBH", 0x60, 0, response_id), (ip, source_port))
+            # 2.xx codes are 0x40 - 0x5F
+            if code >> 5 != 2:
+                continue
+            if probe[1] == SYNC_PROBE and _is_counter(payload):
+                answers.setdefault(ip, set()).add(SYNC_PROBE)
+            elif probe[1] == STATUS_PROBE and _is_status(payload):
+                answers.setdefault(ip, set()).add(STATUS_PROBE)
+
+    devices = []
+    for ip in sorted(answers, key=ipaddress.ip_address):
+        protocol = "coap" if SYNC_PROBE in answers[ip] else "plain_coap"
+        devices.append({"ip": ip, "protocol": protocol})
+    return devices
@@ -0,0 +1,360 @@
+"""Gateway daemon."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from pyairctrl import json_codec
+from pyairctrl.clients import PROTOCOLS, create_client
+
+DEFAULT_SOCKET = "~/.pyairctrl.sock"
+
+OPERATIONS = {
+    "status": ("get_status", False),
+    "filters": ("get_filters", False),
+    "firmware": ("get_firmware", False),
+    "wifi": ("get_wifi", False),
+    "set": ("set_values", True),
+    "set_wifi": ("set_wifi", True),
+}
+
+
+class DaemonError(Exception):
+    pass
+
+
+class _Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client = None
+        self.last_used = None
+
+
+class SessionPool:
+    """One live client per device, shared by all requests to the daemon.
+
+    Requests to the same device are serialized, requests to different devices
+    run in parallel. A client which raised an error or returned an empty
+    result, as the CoAP clients do when a request fails, is dropped and
+    created again by the next request, so a device which was restarted gets a
+    fresh sync, key exchange or hello sequence.
+    """
+
+    def __init__(self, deadline=10.0):
+        # airctrl imports this module as a client of the daemon, so the device
+        # stacks are only loaded once the daemon itself runs
+        from pyairctrl.http_client import KeepAliveTransport
+
+        self.deadline = deadline
+        self._transport = KeepAliveTransport(timeout=deadline)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, protocol, host):
+        with self._lock:
+            session = self._sessions.get((protocol, host))
+            if session is None:
+                session = self._sessions[(protocol, host)] = _Session()
+            return session
+
+    def _create_client(self, protocol, host):
+        if protocol not in PROTOCOLS:
+            raise DaemonError("Unknown protocol: {}".format(protocol))
+        return create_client(protocol, host, self._transport, self.deadline)
+
+    @staticmethod
+    def _drop(session):
+        client, session.client = session.client, None
+        if hasattr(client, "close"):
+            client.close()
+
+    def call(self, protocol, host, operation, args=()):
+        if operation not in OPERATIONS:
+            raise DaemonError("Unknown operation: {}".format(operation))
+        method = OPERATIONS[operation][0]
+        session = self._session(protocol, host)
+        with session.lock:
+            try:
+                if session.client is None:
+                    session.client = self._create_client(protocol, host)
+                function = getattr(session.client, method, None)
+                if function is None:
+                    raise DaemonError(
+                        "{} is not supported when using {}".format(operation, protocol)
+                    )
+                result = function(*args)
+                if not result:
+                    self._drop(session)
+                return result
+            except DaemonError:
+                raise
+            except Exception:
+                self._drop(session)
+                raise
+            finally:
+                session.last_used = time.monotonic()
+
+    def keep_alive(self, idle):
+        """Read the status of every device which was idle for ``idle`` seconds."""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        now = time.monotonic()
+        for (protocol, host), session in sessions:
+            if session.last_used is None or now - session.last_used >= idle:
+                try:
+                    self.call(protocol, host, "status")
+                except Exception:
+                    pass
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            with session.lock:
+                self._drop(session)
+        self._transport.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # one JSON request per line, a connection may send many of them
+        for line in self.rfile:
+            self.wfile.write(self.server.handle_line(line) + b"\n")
+
+
+class GatewayServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Answers requests of airctrl on a UNIX socket.
+
+    Requests and responses are single lines of JSON, e.g.
+    ``{"protocol": "http", "host": "192.168.0.17", "op": "status"}`` is
+    answered with ``{"result": {...}}`` or ``{"error": "..."}``. The socket
+    is only accessible by its owner.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, pool):
+        self.path = os.path.expanduser(path)
+        self.pool = pool
+        _remove_stale_socket(self.path)
+        super().__init__(self.path, _Handler)
+        os.chmod(self.path, 0o600)
+
+    def handle_line(self, line):
+        try:
+            request = json_codec.loads(line)
+            result = self.pool.call(
+                request["protocol"],
+                request["host"],
+                request["op"],
+                request.get("args", ()),
+            )
+            response = {"result": result}
+        except Exception as e:
+            response = {"error": str(e) or type(e).__name__}
+        return json_codec.dumps(response).encode("utf8")
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+    raise DaemonError("A daemon is already listening on {}".format(path))
+
+
+class DaemonClient:
+    """Sends requests to a running daemon over one persistent connection."""
+
+    def __init__(self, path=None, timeout=60.0):
+        self.path = os.path.expanduser(path or DEFAULT_SOCKET)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(self.path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._reader = self._socket.makefile("rb")
+
+    def call(self, protocol, host, operation, args=()):
+        request = {"protocol": protocol, "host": host, "op": operation}
+        if args:
+            request["args"] = list(args)
+        self._socket.sendall(json_codec.dumps(request).encode("utf8") + b"\n")
+        line = self._reader.readline()
+        if not line:
+            raise DaemonError("The daemon closed the connection")
+        response = json_codec.loads(line)
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+
+def connect_daemon(path=None):
+    """Return a DaemonClient or None when no daemon is listening on ``path``."""
+    path = os.path.expanduser(path or DEFAULT_SOCKET)
+    if not os.path.exists(path):
+        return None
+    try:
+        return DaemonClient(path)
+    except OSError:
+        return None
+
+
+class DaemonAirClient:
+    """A device client which forwards every call to the daemon."""
+
+    def __init__(self, daemon, host, protocol):
+        self._daemon = daemon
+        self._host = host
+        self._protocol = protocol
+
+    def _call(self, operation, *args):
+        return self._daemon.call(self._protocol, self._host, operation, args)
+
+    def get_status(self, debug=False):
+        return self._call("status")
+
+    def get_filters(self):
+        return self._call("filters")
+
+    def get_firmware(self):
+        return self._call("firmware")
+
+    def get_wifi(self):
+        return self._call("wifi")
+
+    def set_values(self, values, debug=False):
+        return self._call("set", values)
+
+    def set_wifi(self, ssid, pwd):
+        return self._call("set_wifi", ssid, pwd)
+
+
+def _keep_alive(pool, interval, stopped):
+    while not stopped.wait(interval):
+        pool.keep_alive(interval)
+
+
+def _refresh_devices(registry, interval, stopped):
+    while True:
+        try:
+            registry.refresh()
+        except Exception:
+            pass
+        if stopped.wait(interval):
+            return
+
+
+def serve(argv=None):
+    from pyairctrl.fleet import read_hosts_file
+    from pyairctrl.keystore import default_keystore
+    from pyairctrl.registry import DeviceRegistry
+    from pyairctrl.ssdp import NotifyListener
+
+    parser = argparse.ArgumentParser(
+        prog="airctrl serve",
+        description="Keep sessions to air purifiers open for airctrl",
+    )
+    parser.add_argument(
+        "--socket", help="path of the UNIX socket", default=DEFAULT_SOCKET
+    )
+    parser.add_argument(
+        "--ipaddr", help="open a session to this device", action="append", default=[]
+    )
+    parser.add_argument("--hosts-file", help="open sessions to all devices in the file")
+    parser.add_argument(
+        "--protocol",
+        help="protocol of the devices given with --ipaddr and --hosts-file",
+        choices=PROTOCOLS,
+        default="http",
+    )
+    parser.add_argument(
+        "--keepalive",
+        help="seconds after which an idle session is refreshed, 0 to disable",
+        type=float,
+        default=20.0,
+    )
+    parser.add_argument(
+        "--discovery-interval",
+        help="seconds between SSDP discoveries which update the device registry",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--listen-ssdp",
+        help="update the device registry from the announcements of devices",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--deadline", help="seconds to wait for each device", type=float, default=10.0
+    )
+    args = parser.parse_args(argv)
+
+    hosts = list(args.ipaddr)
+    if args.hosts_file:
+        hosts.extend(read_hosts_file(args.hosts_file))
+
+    pool = SessionPool(args.deadline)
+    try:
+        server = GatewayServer(args.socket, pool)
+    except DaemonError as e:
+        print(str(e))
+        sys.exit(1)
+    for host in hosts:
+        try:
+            pool.call(args.protocol, host, "status")
+        except Exception as e:
+            print("[{}] Error: {}".format(host, str(e) or type(e).__name__))
+
+    stopped = threading.Event()
+    if args.keepalive > 0:
+        thread = threading.Thread(
+            target=_keep_alive, args=(pool, args.keepalive, stopped)
+        )
+        thread.daemon = True
+        thread.start()
+    registry = DeviceRegistry(default_keystore())
+    listener = None
+    if args.listen_ssdp:
+        listener = NotifyListener(registry)
+        listener.start()
+    if args.discovery_interval > 0:
+        thread = threading.Thread(
+            target=_refresh_devices, args=(registry, args.discovery_interval, stopped)
+        )
+        thread.daemon = True
+        thread.start()
+    print("Listening on {}".format(server.path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        if listener is not None:
+            listener.stop()
+        server.server_close()
+        pool.close()
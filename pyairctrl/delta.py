@@ -0,0 +1,92 @@
+"""Status deltas."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import time
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_deadbands(specs):
+    """Parse "key=delta" strings, e.g. from the command line."""
+    deadbands = {}
+    for spec in specs or []:
+        key, sep, delta = spec.partition("=")
+        if not sep or not key:
+            raise ValueError("Dead-band must look like key=delta: {}".format(spec))
+        deadbands[key] = float(delta)
+    return deadbands
+
+
+class DeltaTracker:
+    """Remembers the last reported status of every device.
+
+    ``update`` returns only the keys whose value changed since the value
+    last reported for that device, the first status of a device is returned
+    in full. A numeric key with a dead-band in ``deadbands`` only counts as
+    changed once it moved at least that much away from the value reported
+    last, so slow drifts are still reported eventually. Keys which disappear
+    from a status are not reported.
+    """
+
+    def __init__(self, deadbands=None):
+        self.deadbands = dict(deadbands or {})
+        self._reported = {}
+        self._errors = {}
+
+    def update(self, host, status):
+        self._errors.pop(host, None)
+        reported = self._reported.get(host)
+        if reported is None:
+            self._reported[host] = dict(status)
+            return dict(status)
+
+        changes = {}
+        deadbands = self.deadbands
+        for key in status:
+            value = status[key]
+            if key in reported:
+                last = reported[key]
+                if value == last and type(value) is type(last):
+                    continue
+                deadband = deadbands.get(key)
+                if (
+                    deadband is not None
+                    and _is_number(value)
+                    and _is_number(last)
+                    and abs(value - last) < deadband
+                ):
+                    continue
+            changes[key] = value
+        reported.update(changes)
+        return changes
+
+    def update_error(self, host, error):
+        """Return whether the error differs from the last one of the device."""
+        if self._errors.get(host) == error:
+            return False
+        self._errors[host] = error
+        return True
+
+    def forget(self, host):
+        self._reported.pop(host, None)
+        self._errors.pop(host, None)
+
+
+def poll_changes(client, interval=10.0, deadbands=None, tracker=None):
+    """Poll a client forever and yield the changed keys of every new status.
+
+    Polls in which nothing changed yield nothing; the first status is yielded
+    in full.
+    """
+    tracker = tracker or DeltaTracker(deadbands)
+    while True:
+        started = time.monotonic()
+        status = client.get_status()
+        if status:
+            changes = tracker.update(client, status)
+            if changes:
+                yield changes
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
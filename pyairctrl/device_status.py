@@ -0,0 +1,94 @@
+"""Device status."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import sys
+from collections.abc import Mapping
+
+from pyairctrl.status_transformer import STATUS_TRANSFORMER
+
+FIELDS = tuple(STATUS_TRANSFORMER)
+_FIELD_SET = frozenset(FIELDS)
+
+# devices of the same model always report their keys in the same order, so
+# the key tuples are shared between readings
+MAX_LAYOUTS = 1024
+_layouts = {}
+
+
+def _intern_layout(keys):
+    layout = _layouts.get(keys)
+    if layout is None:
+        if len(_layouts) >= MAX_LAYOUTS:
+            return keys
+        layout = _layouts.setdefault(keys, keys)
+    return layout
+
+
+class DeviceStatus(Mapping):
+    """A compact, read-only status reading.
+
+    Every key of STATUS_TRANSFORMER has a fixed slot, string values are
+    interned and keys which are not known go into a small overflow dict. The
+    reading still behaves like the dict it was created from: it iterates in
+    the order reported by the device, compares equal to it and converts back
+    with ``to_dict()``. Known keys can also be read as attributes, e.g.
+    ``status.pm25``.
+    """
+
+    __slots__ = FIELDS + ("_keys", "_extra")
+
+    def __init__(self, status=()):
+        status = dict(status)
+        extra = None
+        for key, value in status.items():
+            if type(value) is str:
+                value = sys.intern(value)
+            if key in _FIELD_SET:
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        object.__setattr__(self, "_keys", _intern_layout(tuple(status)))
+        object.__setattr__(self, "_extra", extra)
+
+    @classmethod
+    def from_dict(cls, status):
+        return status if isinstance(status, cls) else cls(status)
+
+    def to_dict(self):
+        return {key: self[key] for key in self._keys}
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DeviceStatus is read-only")
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        return "DeviceStatus({!r})".format(self.to_dict())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Prometheus exporter."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import argparse
+import http.server
+import re
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from pyairctrl.clients import PROTOCOLS, create_client
+from pyairctrl.fleet import read_hosts_file
+from pyairctrl.http_client import KeepAliveTransport
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_METRICS = [
+    ("airctrl_up", "gauge", "Whether the last poll of the device succeeded."),
+    ("airctrl_requests_total", "counter", "Polls of the device."),
+    ("airctrl_request_errors_total", "counter", "Failed polls of the device."),
+    (
+        "airctrl_request_duration_seconds",
+        "gauge",
+        "Duration of the last poll of the device.",
+    ),
+    (
+        "airctrl_last_success_timestamp_seconds",
+        "gauge",
+        "Time of the last successful poll of the device.",
+    ),
+]
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(key):
+    return "airctrl_" + re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+class DeviceMetrics:
+    def __init__(self, host):
+        self.host = host
+        self.up = 0
+        self.requests = 0
+        self.errors = 0
+        self.duration = None
+        self.last_success = None
+        self.readings = {}
+
+
+class MetricsCache:
+    """The latest metrics of all devices, rendered at most once per change.
+
+    Pollers call ``update`` after every poll, scrapes only read the cached
+    body, so any number of scrapers never cause device I/O.
+    """
+
+    def __init__(self, hosts=()):
+        self._lock = threading.Lock()
+        self._devices = OrderedDict((host, DeviceMetrics(host)) for host in hosts)
+        self._body = None
+
+    def update(self, host, status, error, duration):
+        with self._lock:
+            device = self._devices.get(host)
+            if device is None:
+                device = self._devices[host] = DeviceMetrics(host)
+            device.requests += 1
+            device.duration = duration
+            if error is not None:
+                device.errors += 1
+                device.up = 0
+            else:
+                device.up = 1
+                device.last_success = time.time()
+                readings = {}
+                for key in status:
+                    value = _number(status[key])
+                    if value is not None:
+                        readings[key] = value
+                device.readings = readings
+            self._body = None
+
+    def render(self):
+        with self._lock:
+            if self._body is None:
+                self._body = self._render().encode("utf8")
+            return self._body
+
+    def _render(self):
+        lines = []
+        devices = list(self._devices.values())
+        values = {
+            "airctrl_up": lambda d: d.up,
+            "airctrl_requests_total": lambda d: d.requests,
+            "airctrl_request_errors_total": lambda d: d.errors,
+            "airctrl_request_duration_seconds": lambda d: d.duration,
+            "airctrl_last_success_timestamp_seconds": lambda d: d.last_success,
+        }
+        for name, metric_type, help_text in _METRICS:
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for device in devices:
+                value = values[name](device)
+                if value is not None:
+                    lines.append(
+                        '{}{{host="{}"}} {}'.format(name, _escape(device.host), value)
+                    )
+
+        readings = OrderedDict()
+        for device in devices:
+            for key, value in device.readings.items():
+                readings.setdefault(key, []).append((device.host, value))
+        for key, samples in readings.items():
+            name = _metric_name(key)
+            lines.append("# HELP {} Last {} reported by the device.".format(name, key))
+            lines.append("# TYPE {} gauge".format(name))
+            for host, value in samples:
+                lines.append('{}{{host="{}"}} {}'.format(name, _escape(host), value))
+        return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    """Polls devices in the background and feeds a MetricsCache.
+
+    Every device keeps one client between polls; a client which failed is
+    created again for the next poll. A device whose previous poll is still
+    running is skipped.
+    """
+
+    def __init__(
+        self, hosts, protocol="http", interval=30.0, concurrency=32, deadline=10.0
+    ):
+        self.hosts = hosts
+        self.protocol = protocol
+        self.interval = interval
+        self.deadline = deadline
+        self.cache = MetricsCache(hosts)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._transport = KeepAliveTransport(timeout=deadline)
+        self._clients = {}
+        self._running = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _create_client(self, host):
+        return create_client(self.protocol, host, self._transport, self.deadline)
+
+    def _poll(self, host):
+        start = time.monotonic()
+        status, error = None, None
+        try:
+            client = self._clients.get(host)
+            if client is None:
+                client = self._clients[host] = self._create_client(host)
+            status = client.get_status()
+            if not status:
+                error = "No info found"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if error is not None:
+            self._drop_client(host)
+        self.cache.update(host, status, error, time.monotonic() - start)
+
+    def _drop_client(self, host):
+        client = self._clients.pop(host, None)
+        if hasattr(client, "close"):
+            client.close()
+
+    def poll_once(self):
+        """Start a poll of every idle device and wait for them to finish."""
+        futures = []
+        for host in self.hosts:
+            running = self._running.get(host)
+            if running is not None and not running.done():
+                continue
+            self._running[host] = self._executor.submit(self._poll, host)
+            futures.append(self._running[host])
+        # a hanging device must not hold back the next round of the others
+        wait(futures, timeout=self.interval)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            self._stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="airctrl-exporter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+        for host in list(self._clients):
+            self._drop_client(host)
+        self._transport.close()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.cache.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache):
+        super().__init__(address, MetricsHandler)
+        self.cache = cache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the readings of air purifiers to Prometheus"
+    )
+    parser.add_argument(
+        "--ipaddr", help="IP address of an air purifier", action="append", default=[]
+    )
+    parser.add_argument("--hosts-file", help="file with one IP address per line")
+    parser.add_argument(
+        "--protocol",
+        help="set the communication protocol",
+        choices=PROTOCOLS,
+        default="http",
+    )
+    parser.add_argument(
+        "--interval", help="seconds between polls", type=float, default=30.0
+    )
+    parser.add_argument(
+        "--concurrency", help="number of devices polled at once", type=int, default=32
+    )
+    parser.add_argument(
+        "--deadline", help="seconds to wait for each device", type=float, default=10.0
+    )
+    parser.add_argument("--listen", help="address to listen on", default="")
+    parser.add_argument("--port", help="port to listen on", type=int, default=9896)
+    args = parser.parse_args()
+
+    hosts = list(args.ipaddr)
+    if args.hosts_file:
+        hosts.extend(read_hosts_file(args.hosts_file))
+    if not hosts:
+        print("No devices given. Use --ipaddr or --hosts-file.")
+        sys.exit(1)
+
+    exporter = Exporter(
+        hosts, args.protocol, args.interval, args.concurrency, args.deadline
+    )
+    server = MetricsServer((args.listen, args.port), exporter.cache)
+    exporter.start()
+    print("Serving metrics on port {}".format(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Fleet poller."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import asyncio
+import binascii
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pyairctrl.async_coap_client import AsyncCoAPAirClient
+from pyairctrl.delta import DeltaTracker
+from pyairctrl.device_status import DeviceStatus
+from pyairctrl.http_client import (
+    HTTPAirClient,
+    KeepAliveTransport,
+    create_exchange,
+    derive_session_key,
+    request_exchange,
+)
+from pyairctrl.keystore import default_keystore
+from pyairctrl.plain_coap_client import PlainCoAPAirClient
+from pyairctrl.retry import RetryPolicy
+
+DeviceResult = namedtuple("DeviceResult", ["host", "status", "error", "elapsed"])
+WarmResult = namedtuple("WarmResult", ["host", "session_key", "error", "elapsed"])
+
+
+def read_hosts_file(fpath):
+    """Read one host per line, skipping blank lines and # comments."""
+    hosts = []
+    with open(fpath, "r") as f:
+        for line in f:
+            host = line.split("#", 1)[0].strip()
+            if host:
+                hosts.append(host)
+    return hosts
+
+
+class FleetPoller:
+    """Polls the status of many devices with bounded concurrency.
+
+    Encrypted CoAP devices are driven natively on the event loop, HTTP and
+    plain CoAP devices run on a thread pool of ``concurrency`` workers.
+    Results are yielded in completion order, a device which does not answer
+    within ``deadline`` seconds is reported with a TimeoutError. Statuses are
+    returned as compact DeviceStatus records. Blocking requests time out
+    after half the deadline and are only retried within the other half, so
+    an abandoned worker does not keep the pool busy for long. close() must
+    be called when the poller is no longer used.
+    """
+
+    def __init__(self, hosts, protocol="http", concurrency=32, deadline=10.0):
+        self.hosts = hosts
+        self.protocol = protocol
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self._transport = KeepAliveTransport(timeout=deadline / 2)
+        self._retry_policy = RetryPolicy(budget=deadline / 2)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def poll(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [self._poll_with_deadline(host, semaphore) for host in self.hosts]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    async def poll_changes(self, interval=10.0, deadbands=None, tracker=None):
+        """Poll all devices every ``interval`` seconds and yield only changes.
+
+        The status of a yielded DeviceResult only holds the keys which changed
+        according to the DeltaTracker, devices without changes are skipped
+        and an error is only yielded when it differs from the previous one.
+        """
+        tracker = tracker or DeltaTracker(deadbands)
+        loop = asyncio.get_event_loop()
+        while True:
+            started = loop.time()
+            async for result in self.poll():
+                if result.error is not None:
+                    if tracker.update_error(result.host, str(result.error)):
+                        yield result
+                    continue
+                if not result.status:
+                    continue
+                changes = tracker.update(result.host, result.status)
+                if changes:
+                    yield result._replace(status=changes)
+            await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+    async def _poll_with_deadline(self, host, semaphore):
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                status = await asyncio.wait_for(
+                    self._poll_one(host), self.deadline
+                )
+                if status is not None:
+                    status = DeviceStatus(status)
+                error = None
+            except asyncio.TimeoutError:
+                status, error = None, TimeoutError("no answer within deadline")
+            except Exception as e:
+                status, error = None, e
+            return DeviceResult(host, status, error, time.monotonic() - start)
+
+    async def _poll_one(self, host):
+        if self.protocol == "coap":
+            client = AsyncCoAPAirClient(host, timeout=self.deadline)
+            try:
+                await client.connect()
+                return await client.get_status()
+            finally:
+                client.close()
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self._poll_blocking, host)
+
+    def _poll_blocking(self, host):
+        if self.protocol == "http":
+            client = HTTPAirClient(
+                host,
+                transport=self._transport,
+                optimistic=True,
+                retry_policy=self._retry_policy,
+            )
+        elif self.protocol == "plain_coap":
+            client = PlainCoAPAirClient(host, timeout=self.deadline / 2)
+        else:
+            raise ValueError("Unknown protocol: {}".format(self.protocol))
+        return client.get_status()
+
+    def close(self):
+        # do not wait for workers which were abandoned at the deadline
+        self._executor.shutdown(wait=False)
+        self._transport.close()
+
+
+def warm_keys(hosts, concurrency=32, processes=None, deadline=10.0, keystore=None):
+    """Exchange fresh session keys with many HTTP devices at once.
+
+    The modular exponentiations run on a pool of ``processes`` worker
+    processes while up to ``concurrency`` exchanges wait for the network.
+    All new keys are saved with a single write to the key store. Returns a
+    WarmResult with the elapsed time for every host in completion order.
+    """
+    keystore = keystore or default_keystore()
+    transport = KeepAliveTransport(timeout=deadline)
+    loop = asyncio.new_event_loop()
+    try:
+        with ProcessPoolExecutor(processes) as cpu, ThreadPoolExecutor(
+            concurrency
+        ) as io:
+            results = loop.run_until_complete(
+                _warm_keys(hosts, concurrency, cpu, io, transport)
+            )
+    finally:
+        transport.close()
+        loop.close()
+
+    keys = OrderedDict(
+        (r.host, binascii.hexlify(r.session_key).decode("ascii"))
+        for r in results
+        if r.error is None
+    )
+    if keys:
+        keystore.set_many("keys", keys)
+        validated_at = repr(time.time())
+        keystore.set_many("validated", {host: validated_at for host in keys})
+    return results
+
+
+async def _warm_keys(hosts, concurrency, cpu, io, transport):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(host):
+        loop = asyncio.get_event_loop()
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                a, A = await loop.run_in_executor(cpu, create_exchange)
+                dh = await loop.run_in_executor(io, request_exchange, transport, host, A)
+                session_key = await loop.run_in_executor(cpu, derive_session_key, a, dh)
+                error = None
+            except Exception as e:
+                session_key, error = None, e
+            return WarmResult(host, session_key, error, time.monotonic() - start)
+
+    return [await task for task in asyncio.as_completed([warm(h) for h in hosts])]
@@ -2,19 +2,20 @@
 
 # pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
 
-import base64
 import binascii
-import configparser
-import json
-import os
-import random
-import socket
-import urllib.request
-import xml.etree.ElementTree as ET
-
-from collections import OrderedDict
+import http.client
+import secrets
+import threading
+import time
+import urllib.error
+
 from Cryptodome.Cipher import AES
-from Cryptodome.Util.Padding import pad, unpad
+
+from pyairctrl import json_codec
+from pyairctrl.http_codec import HTTPCodec
+from pyairctrl.keystore import default_keystore
+from pyairctrl.retry import RetryPolicy
+from pyairctrl.ssdp import discover
 
 G = int(
     "A4D1CBD5C3FD34126765A442EFB99905F8104DD258AC507FD6406CFF14266D31266FEA1E5C41564B777E690F5504F213160217B4B01B886A5E91547F9E2749F4D7FBD7D3B9A92EE1909D0D2263F80A76A6A24C087A091F531DBF0A0169B6A28AD662A4D18E73AFA32D779D5918D08BC8858F4DCEF97C2A24855E6EEB22B3B2E5",
@@ -33,145 +34,240 @@ def aes_decrypt(data, key):
 
 
 def encrypt(values, key):
-    # add two random bytes in front of the body
-    data = "AA" + json.dumps(values)
-    data = pad(bytearray(data, "ascii"), 16, style="pkcs7")
-    iv = bytes(16)
-    cipher = AES.new(key, AES.MODE_CBC, iv)
-    data_enc = cipher.encrypt(data)
-    return base64.b64encode(data_enc)
+    return HTTPCodec(key).encode(values)
 
 
 def decrypt(data, key):
-    payload = base64.b64decode(data)
-    data = aes_decrypt(payload, key)
-    # response starts with 2 random bytes, exclude them
-    response = unpad(data, 16, style="pkcs7")[2:]
-    return response.decode("ascii")
+    return HTTPCodec(key).decrypt(data).decode("ascii")
+
+
+def create_exchange():
+    """Return a private exponent and the public value sent to the device."""
+    a = secrets.randbits(256)
+    A = pow(G, a, P)
+    return a, A
+
+
+def request_exchange(transport, host, A):
+    data = json_codec.dumps({"diffie": format(A, "x")}).encode("ascii")
+    resp = transport.request(host, "PUT", "/di/v1/products/0/security", data)
+    return json_codec.loads(resp)
+
+
+def derive_session_key(a, dh):
+    B = int(dh["hellman"], 16)
+    s = pow(B, a, P)
+    s_bytes = s.to_bytes(128, byteorder="big")[:16]
+    session_key = aes_decrypt(bytes.fromhex(dh["key"]), s_bytes)
+    return session_key[:16]
+
+
+class _PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.last_used = None
+        self.buffer = bytearray(4096)
+
+
+class KeepAliveTransport:
+    """Keeps one persistent HTTP connection per host.
+
+    Connections which were idle for longer than ``idle_timeout`` seconds are
+    reopened before use, and a request on a reused connection which the
+    device has closed in the meantime is retried once on a fresh one.
+    """
+
+    def __init__(self, idle_timeout=30.0, timeout=None):
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._pool = {}
+        self._lock = threading.Lock()
+
+    def _pooled(self, host):
+        with self._lock:
+            pooled = self._pool.get(host)
+            if pooled is None:
+                if self.timeout is None:
+                    connection = http.client.HTTPConnection(host)
+                else:
+                    connection = http.client.HTTPConnection(host, timeout=self.timeout)
+                pooled = _PooledConnection(connection)
+                self._pool[host] = pooled
+            return pooled
+
+    def request(self, host, method, path, body=None, decode=None):
+        """Send a request and return the response body.
+
+        With ``decode`` the body is read into a buffer kept with the
+        connection and ``decode(memoryview)`` is returned instead; the
+        memoryview must not be used once ``decode`` has returned.
+        """
+        pooled = self._pooled(host)
+        with pooled.lock:
+            connection = pooled.connection
+            if (
+                pooled.last_used is not None
+                and time.monotonic() - pooled.last_used > self.idle_timeout
+            ):
+                connection.close()
+            reused = connection.sock is not None
+            try:
+                status, reason, headers, data = self._send(
+                    pooled, method, path, body, decode is not None
+                )
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                if not reused:
+                    raise
+                # the device dropped the idle connection, reconnect once
+                status, reason, headers, data = self._send(
+                    pooled, method, path, body, decode is not None
+                )
+            except Exception:
+                connection.close()
+                raise
+            pooled.last_used = time.monotonic()
+
+            if status >= 400:
+                url = "http://{}{}".format(host, path)
+                raise urllib.error.HTTPError(url, status, reason, headers, None)
+            if decode is not None:
+                return decode(data)
+        return data
+
+    def _send(self, pooled, method, path, body, buffered):
+        connection = pooled.connection
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        if not buffered or response.length is None:
+            data = response.read()
+        else:
+            size = response.length
+            if len(pooled.buffer) < size:
+                pooled.buffer = bytearray(size)
+            data = memoryview(pooled.buffer)[:size]
+            received = 0
+            while received < size:
+                n = response.readinto(data[received:])
+                if not n:
+                    raise http.client.IncompleteRead(bytes(data[:received]), size)
+                received += n
+        return response.status, response.reason, response.headers, data
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, {}
+        for pooled in pool.values():
+            with pooled.lock:
+                pooled.connection.close()
+
+
+DEFAULT_TRANSPORT = KeepAliveTransport()
 
 
 class HTTPAirClient:
     @staticmethod
     def ssdp(timeout=1, repeats=3):
-        addr = "239.255.255.250"
-        port = 1900
-        msg = "\r\n".join(
-            [
-                "M-SEARCH * HTTP/1.1",
-                "HOST: {}:{}".format(addr, port),
-                "ST: urn:philips-com:device:DiProduct:1",
-                "MX: 1",
-                'MAN: "ssdp:discover"',
-                "",
-                "",
-            ]
-        ).encode("ascii")
-        urls = {}
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            if hasattr(socket, "SO_REUSEPORT"):
-                # SO_REUSEPORT is not supported on some systems
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            s.setsockopt(socket.SOL_IP, socket.IP_MULTICAST_TTL, 20)
-            s.settimeout(timeout)
-            for i in range(repeats):
-                s.sendto(msg, (addr, port))
-                try:
-                    while True:
-                        data, (ip, _) = s.recvfrom(1024)
-                        url = next(
-                            (
-                                x
-                                for x in data.decode("ascii").splitlines()
-                                if x.startswith("LOCATION: ")
-                            ),
-                            None,
-                        )
-                        urls.update({ip: url[10:]})
-                except socket.timeout:
-                    pass
-                if len(urls):
-                    break
-        resp = []
-        for ip in urls.keys():
-            with urllib.request.urlopen(urls[ip]) as response:
-                xml = ET.fromstring(response.read())
-                resp.append({"ip": ip})
-                ns = {"urn": "urn:schemas-upnp-org:device-1-0"}
-                for d in xml.findall("urn:device", ns):
-                    for t in ["modelName", "modelNumber", "friendlyName"]:
-                        resp[-1].update({t: d.find("urn:" + t, ns).text})
+        return list(discover(timeout, repeats))
 
-        return resp
+    def __init__(
+        self,
+        host,
+        debug=False,
+        transport=None,
+        keystore=None,
+        optimistic=False,
+        key_ttl=300.0,
+        retry_policy=None,
+    ):
+        """Create a client for the device at ``host``.
 
-    def __init__(self, host, debug=False):
+        A cached session key is normally verified with an extra request unless
+        it was validated less than ``key_ttl`` seconds ago. With ``optimistic``
+        the cached key is always used as is and a new key is only exchanged
+        when a real request fails to decrypt. ``retry_policy`` decides how
+        failed requests are retried, see RetryPolicy.
+        """
         self._host = host
         self._session_key = None
+        self._codec = None
         self._debug = debug
+        self._transport = transport or DEFAULT_TRANSPORT
+        self._keystore = keystore or default_keystore()
+        self._optimistic = optimistic
+        self._key_ttl = key_ttl
+        self._validated_at = None
+        self._retry_policy = retry_policy or RetryPolicy()
         self.load_key()
 
+    def _request(self, method, path, body=None, decode=None):
+        return self._transport.request(self._host, method, path, body, decode)
+
+    def _set_session_key(self, session_key):
+        self._session_key = session_key
+        self._codec = HTTPCodec(session_key)
+
     def _get_key(self):
         if self._debug:
             print("Exchanging secret key with the device ...")
-        url = "http://{}/di/v1/products/0/security".format(self._host)
-        a = random.getrandbits(256)
-        A = pow(G, a, P)
-        data = json.dumps({"diffie": format(A, "x")})
-        data_enc = data.encode("ascii")
-        req = urllib.request.Request(url=url, data=data_enc, method="PUT")
-        with urllib.request.urlopen(req) as response:
-            resp = response.read().decode("ascii")
-            dh = json.loads(resp)
-        key = dh["key"]
-        B = int(dh["hellman"], 16)
-        s = pow(B, a, P)
-        s_bytes = s.to_bytes(128, byteorder="big")[:16]
-        session_key = aes_decrypt(bytes.fromhex(key), s_bytes)
-        self._session_key = session_key[:16]
+        a, A = create_exchange()
+        dh = request_exchange(self._transport, self._host, A)
+        self._set_session_key(derive_session_key(a, dh))
         self._save_key()
+        self._key_validated()
 
     def _save_key(self):
-        config = configparser.ConfigParser()
-        fpath = os.path.expanduser("~/.pyairctrl")
-        config.read(fpath)
-        if "keys" not in config.sections():
-            config["keys"] = {}
         hex_key = binascii.hexlify(self._session_key).decode("ascii")
-        config["keys"][self._host] = hex_key
-
         if self._debug:
+            fpath = self._keystore.path
             print("Saving session_key {} to {}".format(hex_key, fpath))
-        with open(fpath, "w") as f:
-            config.write(f)
+        self._keystore.set("keys", self._host, hex_key)
 
     def load_key(self):
-        fpath = os.path.expanduser("~/.pyairctrl")
-        if os.path.isfile(fpath):
-            config = configparser.ConfigParser()
-            config.read(fpath)
-            if "keys" in config and self._host in config["keys"]:
-                hex_key = config["keys"][self._host]
-                self._session_key = bytes.fromhex(hex_key)
+        hex_key = self._keystore.get("keys", self._host)
+        if hex_key is not None:
+            self._set_session_key(bytes.fromhex(hex_key))
+            if not self._optimistic and not self._key_is_fresh():
                 self._check_key()
-            else:
-                self._get_key()
         else:
             self._get_key()
         return self._session_key
 
     def _check_key(self):
-        url = "http://{}/di/v1/products/1/air".format(self._host)
-        self._get(url)
+        self._get("/di/v1/products/1/air")
+
+    def _key_is_fresh(self):
+        if self._validated_at is None:
+            validated_at = self._keystore.get("validated", self._host)
+            self._validated_at = None if validated_at is None else float(validated_at)
+        return (
+            self._validated_at is not None
+            and time.time() - self._validated_at < self._key_ttl
+        )
+
+    def _key_validated(self):
+        # only persist when the previous validation has expired
+        if not self._key_is_fresh():
+            self._validated_at = time.time()
+            self._keystore.set("validated", self._host, repr(self._validated_at))
+
+    def _with_key(self, request_once, *args):
+        result = self._retry_policy.call(
+            lambda: request_once(*args), self._get_key, self._debug
+        )
+        self._key_validated()
+        return result
+
+    def _put_once(self, path, values):
+        body = self._codec.encode(values)
+        return self._request("PUT", path, body, self._codec.decode)
+
+    def _put(self, path, values):
+        return self._with_key(self._put_once, path, values)
 
     def set_values(self, values):
-        body = encrypt(values, self._session_key)
-        url = "http://{}/di/v1/products/1/air".format(self._host)
-        req = urllib.request.Request(url=url, data=body, method="PUT")
-        with urllib.request.urlopen(req) as response:
-            resp = response.read()
-            resp = decrypt(resp.decode("ascii"), self._session_key)
-            status = json.loads(resp)
-            return status
+        return self._put("/di/v1/products/1/air", values)
 
     def set_wifi(self, ssid, pwd):
         values = {}
@@ -180,59 +276,33 @@ class HTTPAirClient:
         if pwd:
             values["password"] = pwd
 
-        body = encrypt(values, self._session_key)
-        url = "http://{}/di/v1/products/0/wifi".format(self._host)
-        req = urllib.request.Request(url=url, data=body, method="PUT")
-        with urllib.request.urlopen(req) as response:
-            resp = response.read()
-            resp = decrypt(resp.decode("ascii"), self._session_key)
-            wifi = json.loads(resp)
-            return wifi
-
-    def _get_once(self, url):
-        with urllib.request.urlopen(url) as response:
-            resp = response.read()
-            resp = decrypt(resp.decode("ascii"), self._session_key)
-            return json.loads(resp, object_pairs_hook=OrderedDict)
-
-    def _get(self, url):
-        try:
-            return self._get_once(url)
-        except Exception as e:
-            if self._debug:
-                print("GET error: {}".format(str(e)))
-                print("Will retry after getting a new key ...")
-            self._get_key()
-            return self._get_once(url)
+        wifi = self._put("/di/v1/products/0/wifi", values)
+        return wifi
+
+    def _get_once(self, path):
+        return self._request("GET", path, decode=self._codec.decode)
+
+    def _get(self, path):
+        return self._with_key(self._get_once, path)
 
     def get_status(self, debug=False):
-        url = "http://{}/di/v1/products/1/air".format(self._host)
-        status = self._get(url)
+        status = self._get("/di/v1/products/1/air")
         return status
 
     def get_wifi(self):
-        url = "http://{}/di/v1/products/0/wifi".format(self._host)
-        wifi = self._get(url)
+        wifi = self._get("/di/v1/products/0/wifi")
         return wifi
 
     def get_firmware(self):
-        url = "http://{}/di/v1/products/0/firmware".format(self._host)
-        firmware = self._get(url)
+        firmware = self._get("/di/v1/products/0/firmware")
         return firmware
 
     def get_filters(self):
-        url = "http://{}/di/v1/products/1/fltsts".format(self._host)
-        filters = self._get(url)
+        filters = self._get("/di/v1/products/1/fltsts")
         return filters
 
     def pair(self, client_id, client_secret):
         values = {}
         values["Pair"] = ["FI-AIR-AND", client_id, client_secret]
-        body = encrypt(values, self._session_key)
-        url = "http://{}/di/v1/products/0/pairing".format(self._host)
-        req = urllib.request.Request(url=url, data=body, method="PUT")
-        with urllib.request.urlopen(req) as response:
-            resp = response.read()
-            resp = decrypt(resp.decode("ascii"), self._session_key)
-            resp = json.loads(resp)
-            return resp
+        resp = self._put("/di/v1/products/0/pairing", values)
+        return resp
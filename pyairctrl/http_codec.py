@@ -0,0 +1,58 @@
+"""HTTP payload codec."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import binascii
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+
+from pyairctrl import json_codec
+
+_ZERO_IV = bytes(16)
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(
+        len(a), "big"
+    )
+
+
+class HTTPCodec:
+    """Encodes and decodes the encrypted JSON bodies of one session key.
+
+    A body is base64 of the AES-CBC encrypted message with a zero IV, the
+    message starts with two random bytes. For decryption the AES key schedule
+    is set up once per session key in ECB mode and the CBC chaining is
+    applied here, so a codec can be used from several threads. ``decode``
+    accepts any bytes-like object, e.g. a memoryview of a receive buffer, and
+    hands the decrypted bytes to the JSON codec.
+    """
+
+    def __init__(self, session_key):
+        self.session_key = session_key
+        self._cipher = AES.new(session_key, AES.MODE_ECB)
+
+    def decrypt(self, data):
+        payload = binascii.a2b_base64(data)
+        if not payload or len(payload) % 16:
+            raise ValueError("Data must be padded to 16 byte boundary in CBC mode")
+        message = _xor(self._cipher.decrypt(payload), _ZERO_IV + payload[:-16])
+        padding = message[-1]
+        if not 0 < padding <= 16 or message[-padding:] != bytes((padding,)) * padding:
+            raise ValueError("Padding is incorrect.")
+        # the message starts with 2 random bytes, exclude them
+        return message[2:-padding]
+
+    def decode(self, data):
+        return json_codec.loads(self.decrypt(data))
+
+    def encrypt(self, message):
+        # add two random bytes in front of the body
+        message = pad(b"AA" + message, 16, style="pkcs7")
+        # chaining block by block in Python is slower than a new key schedule
+        cipher = AES.new(self.session_key, AES.MODE_CBC, _ZERO_IV)
+        return binascii.b2a_base64(cipher.encrypt(message))[:-1]
+
+    def encode(self, values):
+        return self.encrypt(json_codec.dumps(values).encode("ascii"))
@@ -0,0 +1,106 @@
+"""JSON codec."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import json
+import sys
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# dicts only keep the order of their keys from Python 3.7 on
+DICTS_ARE_ORDERED = sys.version_info >= (3, 7)
+
+
+class StdlibJSONCodec:
+    """The json module of the standard library, decoding into plain dicts."""
+
+    name = "json"
+
+    def loads(self, data):
+        if not isinstance(data, str):
+            data = bytes(data).decode("utf8")
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+
+class OrderedJSONCodec(StdlibJSONCodec):
+    """Decodes into OrderedDicts, only needed before Python 3.7."""
+
+    name = "ordered"
+
+    def loads(self, data):
+        if not isinstance(data, str):
+            data = bytes(data).decode("utf8")
+        return json.loads(data, object_pairs_hook=OrderedDict)
+
+
+class OrJSONCodec:
+    """orjson, which parses bytes and memoryviews without decoding them first."""
+
+    name = "orjson"
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        try:
+            encoded = orjson.dumps(obj)
+        except TypeError:
+            # e.g. integers above 64 bits or non-string keys
+            return json.dumps(obj)
+        if not encoded.isascii():
+            # keep the ASCII escapes of json.dumps, requests are sent as ASCII
+            return json.dumps(obj)
+        return encoded.decode("ascii")
+
+
+CODECS = OrderedDict(
+    (codec.name, codec) for codec in [StdlibJSONCodec, OrderedJSONCodec, OrJSONCodec]
+)
+
+
+def create_json_codec(name="auto"):
+    """Create a codec by name.
+
+    "auto" picks orjson when it is installed, otherwise plain dicts or, before
+    Python 3.7, OrderedDicts so statuses are still printed in device order.
+    """
+    if name == "auto":
+        if orjson is not None:
+            name = "orjson"
+        else:
+            name = "json" if DICTS_ARE_ORDERED else "ordered"
+    if name not in CODECS:
+        raise ValueError("Unknown JSON codec: {}".format(name))
+    if name == "orjson" and orjson is None:
+        raise ValueError("The orjson codec requires the orjson package")
+    return CODECS[name]()
+
+
+_json_codec = create_json_codec()
+
+
+def get_json_codec():
+    return _json_codec
+
+
+def set_json_codec(codec):
+    """Select the codec used by all clients, given by name or as an instance."""
+    global _json_codec
+    if isinstance(codec, str):
+        codec = create_json_codec(codec)
+    _json_codec = codec
+
+
+def loads(data):
+    return _json_codec.loads(data)
+
+
+def dumps(obj):
+    return _json_codec.dumps(obj)
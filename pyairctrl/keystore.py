@@ -0,0 +1,131 @@
+"""Key store."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import configparser
+import os
+import sqlite3
+import threading
+
+LEGACY_PATH = "~/.pyairctrl"
+DEFAULT_PATH = "~/.pyairctrl.db"
+
+
+class KeyStore:
+    """Session keys and cloud credentials stored in SQLite.
+
+    Values are addressed by section and name, e.g. ("keys", "192.168.0.17").
+    Every lookup is a single primary-key query and every update runs in its
+    own transaction, so parallel airctrl processes never lose each other's
+    writes. Entries of the old ~/.pyairctrl INI file are imported the first
+    time the store is opened; the INI file itself is left untouched.
+    """
+
+    def __init__(self, path=None, legacy_path=None):
+        self.path = os.path.expanduser(path or DEFAULT_PATH)
+        self.legacy_path = os.path.expanduser(legacy_path or LEGACY_PATH)
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # a fresh connection per operation keeps the store usable from threads
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        with self._lock:
+            if not self._initialized:
+                self._initialize(connection)
+                self._initialized = True
+        return connection
+
+    def _initialize(self, connection):
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "section TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (section, name))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            migrated = connection.execute(
+                "SELECT value FROM meta WHERE name = 'migrated'"
+            ).fetchone()
+            if migrated is None:
+                self._migrate(connection)
+                connection.execute(
+                    "INSERT INTO meta (name, value) VALUES ('migrated', '1')"
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _migrate(self, connection):
+        if not os.path.isfile(self.legacy_path):
+            return
+        config = configparser.ConfigParser()
+        config.read(self.legacy_path)
+        for section in config.sections():
+            connection.executemany(
+                "INSERT OR IGNORE INTO entries (section, name, value) VALUES (?, ?, ?)",
+                [(section, name, value) for name, value in config[section].items()],
+            )
+
+    def get(self, section, name, default=None):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT value FROM entries WHERE section = ? AND name = ?",
+                (section, name),
+            ).fetchone()
+        finally:
+            connection.close()
+        return default if row is None else row[0]
+
+    def items(self, section):
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT name, value FROM entries WHERE section = ?", (section,)
+            ).fetchall()
+        finally:
+            connection.close()
+        return dict(rows)
+
+    def set(self, section, name, value):
+        self.set_many(section, {name: value})
+
+    def set_many(self, section, values):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (section, name, value) "
+                    "VALUES (?, ?, ?)",
+                    [(section, name, value) for name, value in values.items()],
+                )
+        finally:
+            connection.close()
+
+    def delete(self, section, name):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM entries WHERE section = ? AND name = ?",
+                    (section, name),
+                )
+        finally:
+            connection.close()
+
+
+_default_keystore = None
+
+
+def default_keystore():
+    global _default_keystore
+    if _default_keystore is None:
+        _default_keystore = KeyStore()
+    return _default_keystore
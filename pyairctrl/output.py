@@ -0,0 +1,167 @@
+"""Output formats."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import csv
+import sys
+
+from pyairctrl import json_codec
+from pyairctrl.status_renderer import render_plan
+from pyairctrl.status_transformer import STATUS_TRANSFORMER
+
+FORMATS = ["text", "json", "ndjson", "csv"]
+
+
+def _subset_keys(subset):
+    return [key for key, info in STATUS_TRANSFORMER.items() if info[1] == subset]
+
+
+class TextOutput:
+    """The human readable output of airctrl."""
+
+    def __init__(self, stream=None, show_host=False):
+        self._stream = stream
+        self.show_host = show_host
+
+    @property
+    def stream(self):
+        # resolved late so that a replaced sys.stdout is honoured
+        return self._stream or sys.stdout
+
+    def write_status(self, host, status, subset=None, print_key=True):
+        text = render_plan(subset, print_key).render(status)
+        if self.show_host:
+            text = "[{}]\n".format(host) + text
+        self.stream.write(text)
+        self.stream.flush()
+
+    def write_message(self, host, message):
+        if self.show_host:
+            message = "[{}]\n".format(host) + message
+        self.stream.write(message + "\n")
+        self.stream.flush()
+
+    def write_error(self, host, error):
+        self.write_message(host, "Error: {}".format(error))
+
+    def close(self):
+        pass
+
+
+class NDJSONOutput(TextOutput):
+    """One JSON object per line and device, with the raw device values."""
+
+    def _record(self, host, status, subset):
+        record = {"host": host}
+        if subset is None:
+            record.update(status)
+        else:
+            record.update((k, status[k]) for k in _subset_keys(subset) if k in status)
+        return record
+
+    def _write_record(self, record):
+        self.stream.write(json_codec.dumps(record) + "\n")
+        self.stream.flush()
+
+    def write_status(self, host, status, subset=None, print_key=True):
+        self._write_record(self._record(host, status, subset))
+
+    def write_message(self, host, message):
+        self._write_record({"host": host, "error": message})
+
+    def write_error(self, host, error):
+        self.write_message(host, str(error))
+
+
+class JSONOutput(NDJSONOutput):
+    """A JSON array of records, streamed one element at a time."""
+
+    def __init__(self, stream=None, show_host=False):
+        super().__init__(stream, show_host)
+        self._started = False
+
+    def _write_record(self, record):
+        self.stream.write(",\n" if self._started else "[")
+        self._started = True
+        self.stream.write(json_codec.dumps(record))
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write("]\n" if self._started else "[]\n")
+        self.stream.flush()
+
+
+class CSVOutput(NDJSONOutput):
+    """One row per device with a fixed header.
+
+    The columns are the known keys of the first written subset, so rows of
+    different devices line up; any other keys are collected as JSON in the
+    "other" column.
+    """
+
+    def __init__(self, stream=None, show_host=False):
+        super().__init__(stream, show_host)
+        self._writer = None
+        self._columns = None
+
+    def _start(self, subset):
+        if self._writer is None:
+            keys = list(STATUS_TRANSFORMER) if subset is None else _subset_keys(subset)
+            self._columns = ["host", "error"] + keys
+            self._writer = csv.writer(self.stream, lineterminator="\n")
+            self._writer.writerow(self._columns + ["other"])
+
+    def write_status(self, host, status, subset=None, print_key=True):
+        self._start(subset)
+        self._write_record(self._record(host, status, subset))
+
+    def write_message(self, host, message):
+        self._start(None)
+        self._write_record({"host": host, "error": message})
+
+    def _write_record(self, record):
+        other = {k: v for k, v in record.items() if k not in self._columns}
+        row = [record.get(k, "") for k in self._columns]
+        row.append(json_codec.dumps(other) if other else "")
+        self._writer.writerow(row)
+        self.stream.flush()
+
+
+class RecordingOutput:
+    """Passes everything on to ``output`` and records full statuses."""
+
+    def __init__(self, output, recorder):
+        self.output = output
+        self.recorder = recorder
+
+    def write_status(self, host, status, subset=None, print_key=True):
+        # filters, firmware and wifi are written without keys
+        if subset is None and print_key:
+            self.recorder.append(host, status)
+        self.output.write_status(host, status, subset, print_key)
+
+    def write_message(self, host, message):
+        self.output.write_message(host, message)
+
+    def write_error(self, host, error):
+        self.output.write_error(host, error)
+
+    def close(self):
+        try:
+            self.output.close()
+        finally:
+            self.recorder.close()
+
+
+OUTPUTS = {
+    "text": TextOutput,
+    "json": JSONOutput,
+    "ndjson": NDJSONOutput,
+    "csv": CSVOutput,
+}
+
+
+def create_output(output_format="text", stream=None, show_host=False):
+    if output_format not in OUTPUTS:
+        raise ValueError("Unknown output format: {}".format(output_format))
+    return OUTPUTS[output_format](stream, show_host)
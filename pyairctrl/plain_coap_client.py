@@ -2,35 +2,119 @@
 
 # pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
 
-import json
 import logging
 import os
+import random
 import socket
 import struct
 import sys
 import time
 
-from collections import OrderedDict
 from coapthon import defines
 from coapthon.client.helperclient import HelperClient
+from coapthon.messages.message import Message
 from coapthon.messages.request import Request
 from coapthon.utils import generate_random_token
 
+from pyairctrl import json_codec
+from pyairctrl.snapshot_cache import SnapshotCache
+
 
 class NotSupportedException(Exception):
     pass
 
 
 class PlainCoAPAirClient:
-    def __init__(self, host, port=5683):
+    """Client for devices speaking unencrypted CoAP.
+
+    Used as a context manager the client keeps one CoAP client open and only
+    repeats the hello sequence after ``session_timeout`` seconds of
+    inactivity or after a failed request:
+
+        with PlainCoAPAirClient(host) as client:
+            client.get_status()
+            client.set_values(values)
+
+    With a ``snapshot_ttl`` above 0 status, filters and firmware are served
+    from one fetched status document for that many seconds, with
+    ``invalidate_on_set`` the first read after set_values fetches again.
+    Each request waits ``timeout`` seconds for an answer.
+    """
+
+    def __init__(
+        self,
+        host,
+        port=5683,
+        session_timeout=30.0,
+        snapshot_ttl=0.0,
+        invalidate_on_set=False,
+        timeout=2.0,
+    ):
         self.coapthon_logger = logging.getLogger("coapthon")
         self.coapthon_logger.setLevel("WARN")
         self.server = host
         self.port = port
+        self.session_timeout = session_timeout
+        self.timeout = timeout
+        self._session_client = None
+        self._last_activity = None
+        self._snapshot = SnapshotCache(snapshot_ttl, invalidate_on_set)
+
+    def __enter__(self):
+        self.open_session()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open_session(self):
+        if self._session_client is None:
+            self._session_client = self._create_coap_client(self.server, self.port)
+            self._last_activity = None
+
+    def close(self):
+        if self._session_client is not None:
+            self._session_client.stop()
+            self._session_client = None
 
     def _create_coap_client(self, host, port):
         return HelperClient(server=(host, port))
 
+    def _run(self, action):
+        if self._session_client is None:
+            client = self._create_coap_client(self.server, self.port)
+            try:
+                self._send_hello_sequence(client)
+                return action(client)
+            finally:
+                client.stop()
+
+        client = self._session_client
+        if (
+            self._last_activity is None
+            or time.monotonic() - self._last_activity > self.session_timeout
+        ):
+            self._send_hello_sequence(client)
+        try:
+            response = action(client)
+        except Exception:
+            response = None
+        if response is None:
+            # the device may have closed its CoAP port, say hello again
+            self._send_hello_sequence(client)
+            response = action(client)
+        self._last_activity = time.monotonic() if response is not None else None
+        return response
+
+    def _cancel_observing(self, client, response):
+        message = Message()
+        message.destination = (self.server, self.port)
+        message.code = defines.Codes.EMPTY.number
+        message.type = defines.Types["RST"]
+        message.token = response.token
+        message.mid = response.mid
+        client.send_empty(message)
+
     def _send_over_socket(self, destination, packet):
         protocol = socket.getprotobyname("icmp")
         if os.geteuid() == 0:
@@ -46,38 +130,35 @@ class PlainCoAPAirClient:
 
     def _get(self):
         path = "/sys/dev/status"
-        response = None
-        try:
-            client = self._create_coap_client(self.server, self.port)
-            self._send_hello_sequence(client)
+
+        def get_status(client):
             request = client.mk_request(defines.Codes.GET, path)
-            request.destination = server = (self.server, self.port)
+            request.destination = (self.server, self.port)
             request.type = defines.Types["ACK"]
             request.token = generate_random_token(4)
             request.observe = 0
-            response = client.send_request(request, None, 2)
-        finally:
+            response = client.send_request(request, None, self.timeout)
             if response:
-                client.cancel_observing(response, True)
-            client.stop()
+                self._cancel_observing(client, response)
+            return response
 
+        response = self._run(get_status)
         if response:
-            return json.loads(response.payload, object_pairs_hook=OrderedDict)["state"]["reported"]
+            return json_codec.loads(response.payload)["state"]["reported"]
         else:
             return {}
 
     def _set(self, key, value):
         path = "/sys/dev/control"
-        try:
-            client = self._create_coap_client(self.server, self.port)
-            self._send_hello_sequence(client)
-            payload = {"state": {"desired": {key: value}}}
-            response = client.post(path, json.dumps(payload))
-            return response.payload == '{"status":"success"}'
-        finally:
-            client.stop()
+        payload = {"state": {"desired": {key: value}}}
+        body = json_codec.dumps(payload)
+        response = self._run(
+            lambda client: client.post(path, body, timeout=self.timeout)
+        )
+        return response is not None and response.payload == '{"status":"success"}'
 
-    def _send_hello_sequence(self, client):
+    def send_hello(self):
+        """Send the ICMP packet after which the device answers on its CoAP port."""
         ownIp = self._get_ip()
 
         header = self._create_icmp_header()
@@ -87,14 +168,44 @@ class PlainCoAPAirClient:
 
         self._send_over_socket(self.server, packet)
 
-        # that is needed to give device time to open coap port, otherwise it may not respond properly
-        time.sleep(0.5)
+    def _send_hello_sequence(self, client):
+        self.send_hello()
+
+        # give device time to open coap port, otherwise it may not respond properly
+        self._wait_until_ready()
 
         request = Request()
         request.destination = server = (self.server, self.port)
         request.code = defines.Codes.EMPTY.number
         client.send_empty(request)
 
+    def _wait_until_ready(self, timeout=0.5, interval=0.05):
+        """Ping the CoAP port until the device answers, at most ``timeout`` seconds."""
+        mid = random.randint(0, 0xFFFF)
+        # confirmable empty message (CoAP ping), answered with RST
+        ping = struct.pack("!BBH", 0x40, 0, mid)
+        deadline = time.monotonic() + timeout
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect((self.server, self.port))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                try:
+                    s.settimeout(min(interval, remaining))
+                    s.send(ping)
+                    data = s.recv(1024)
+                    if len(data) >= 4 and struct.unpack("!BBH", data[:4])[2] == mid:
+                        return True
+                except socket.timeout:
+                    pass
+                except OSError:
+                    # port is still closed (ICMP port unreachable)
+                    time.sleep(min(interval, max(0, deadline - time.monotonic())))
+        finally:
+            s.close()
+
     def _get_ip(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
@@ -216,16 +327,26 @@ class PlainCoAPAirClient:
     def set_values(self, values, debug=False):
         if debug:
             self.coapthon_logger.setLevel("DEBUG")
-        result = True
-        for key in values:
-            result = result and self._set(key, values[key])
+
+        # send all keys after a single hello sequence
+        own_session = self._session_client is None
+        if own_session:
+            self.open_session()
+        try:
+            result = True
+            for key in values:
+                result = result and self._set(key, values[key])
+        finally:
+            self._snapshot.values_set()
+            if own_session:
+                self.close()
 
         return result
 
     def get_status(self, debug=False):
         if debug:
             self.coapthon_logger.setLevel("DEBUG")
-        status = self._get()
+        status = self._snapshot.get(self._get)
         return status
 
     def get_wifi(self):
@@ -235,11 +356,9 @@ class PlainCoAPAirClient:
         raise NotSupportedException
 
     def get_firmware(self):
-        status = self._get()
-        # TODO Really transmit full status here?
+        status = self._snapshot.get(self._get)
         return status
 
     def get_filters(self):
-        status = self._get()
-        # TODO Really transmit full status here?
+        status = self._snapshot.get(self._get)
         return status
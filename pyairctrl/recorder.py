@@ -0,0 +1,265 @@
+"""Time-series recorder."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import array
+import datetime
+import fcntl
+import math
+import mmap
+import os
+import re
+import struct
+import time
+
+FIELDS = ("pm25", "iaql", "tvoc", "rh", "temp", "fltsts0", "fltsts1", "fltsts2", "err")
+
+MAGIC = b"PYAIRREC"
+VERSION = 1
+# magic, version, number of fields, offset of the first record
+_HEADER = struct.Struct("<8sHHI")
+# a day gets further segments "<day>.<n>.seg" when the fields change
+_SEGMENT_NAME = re.compile(r"^(\d{8})(?:\.(\d+))?\.seg$")
+
+
+def _device_dir(host):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", host)
+
+
+def _day(timestamp):
+    utc = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+    return utc.strftime("%Y%m%d")
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class Series:
+    """Records of one device, one row per reading.
+
+    ``data`` is a NumPy view of shape (rows, 1 + fields) when NumPy is
+    installed and a flat array("d") otherwise. ``series["pm25"]`` returns a
+    single column, ``series.timestamps`` the first one.
+    """
+
+    def __init__(self, fields, data):
+        self.fields = fields
+        self.data = data
+        self._width = len(fields) + 1
+
+    def __len__(self):
+        if isinstance(self.data, array.array):
+            return len(self.data) // self._width
+        return self.data.shape[0]
+
+    def _column(self, index):
+        if isinstance(self.data, array.array):
+            return self.data[index :: self._width]
+        return self.data[:, index]
+
+    @property
+    def timestamps(self):
+        return self._column(0)
+
+    def __getitem__(self, field):
+        return self._column(self.fields.index(field) + 1)
+
+
+class Segment:
+    """One segment file mapped read-only into memory."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError("Not a recorder segment: {}".format(path))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, nfields, offset = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError("Not a recorder segment: {}".format(path))
+        names = self._mmap[_HEADER.size : offset].rstrip(b"\0").decode("ascii")
+        self.fields = tuple(names.split(","))
+        self.width = nfields + 1
+        self.offset = offset
+        record_size = 8 * self.width
+        # a partly written last record is ignored
+        self.rows = (size - offset) // record_size
+        self.values = memoryview(self._mmap)[
+            offset : offset + self.rows * record_size
+        ].cast("d")
+
+    def _bisect(self, timestamp):
+        low, high = 0, self.rows
+        values, width = self.values, self.width
+        while low < high:
+            middle = (low + high) // 2
+            if values[middle * width] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def select(self, start=None, end=None):
+        """Return the rows with start <= timestamp < end as a flat memoryview."""
+        first = 0 if start is None else self._bisect(start)
+        last = self.rows if end is None else self._bisect(end)
+        return self.values[first * self.width : max(first, last) * self.width]
+
+    def close(self):
+        self.values.release()
+        self._mmap.close()
+
+
+class Recorder:
+    """Appends numeric readings to per-device, per-day segment files.
+
+    Every record is a timestamp plus one float64 per field, missing or
+    non-numeric values are stored as NaN. Files live in
+    ``directory/<host>/<YYYYMMDD>.seg`` (UTC days) and are only ever
+    appended to, so a reader can map them while the recorder is writing.
+
+    When a segment is reopened, a partly written last record left by a crash
+    is cut off first. A segment written with other fields is left alone and
+    the readings go to ``<YYYYMMDD>.<n>.seg`` instead. Several recorders may
+    write to the same directory: records are appended with single O_APPEND
+    writes under a shared flock, and a segment is only checked or cut off
+    under an exclusive one.
+    """
+
+    def __init__(self, directory, fields=FIELDS):
+        self.directory = directory
+        self.fields = tuple(fields)
+        self._record = struct.Struct("<{}d".format(len(self.fields) + 1))
+        self._files = {}
+
+    def _header(self):
+        names = ",".join(self.fields).encode("ascii")
+        offset = _HEADER.size + len(names)
+        # keep the records 8 byte aligned
+        offset += -offset % 8
+        header = _HEADER.pack(MAGIC, VERSION, len(self.fields), offset) + names
+        return header.ljust(offset, b"\0")
+
+    def _open_segment(self, path):
+        """Open ``path`` for appending, or return None if it has another header."""
+        header = self._header()
+        f = open(path, "a+b")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            existing = f.read(len(header))
+            if len(existing) < len(header) and header.startswith(existing):
+                # a new file or a torn header
+                f.truncate(0)
+                f.write(header)
+                f.flush()
+            elif existing != header:
+                f.close()
+                return None
+            else:
+                # other writers hold a shared lock while appending a record
+                size = f.seek(0, os.SEEK_END)
+                end = size - (size - len(header)) % self._record.size
+                if end != size:
+                    f.truncate(end)
+            fcntl.flock(f, fcntl.LOCK_UN)
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def _file(self, host, day):
+        f = self._files.get(host)
+        if f is not None and f.day == day:
+            return f
+        if f is not None:
+            f.close()
+        path = os.path.join(self.directory, _device_dir(host))
+        os.makedirs(path, exist_ok=True)
+        f = self._open_segment(os.path.join(path, day + ".seg"))
+        number = 0
+        while f is None:
+            number += 1
+            name = "{}.{}.seg".format(day, number)
+            f = self._open_segment(os.path.join(path, name))
+        f.day = day
+        self._files[host] = f
+        return f
+
+    def append(self, host, status, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        values = [_number(status.get(field)) for field in self.fields]
+        f = self._file(host, _day(timestamp))
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            f.write(self._record.pack(timestamp, *values))
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def hosts(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.listdir(self.directory))
+
+    def segments(self, host, start=None, end=None):
+        path = os.path.join(self.directory, _device_dir(host))
+        if not os.path.isdir(path):
+            return []
+        first = None if start is None else _day(start)
+        last = None if end is None else _day(end)
+        names = []
+        for name in os.listdir(path):
+            m = _SEGMENT_NAME.match(name)
+            if m is None:
+                continue
+            day = m.group(1)
+            if (first is None or day >= first) and (last is None or day <= last):
+                names.append((day, int(m.group(2) or 0), name))
+        return [os.path.join(path, name) for _, _, name in sorted(names)]
+
+    def query(self, host, start=None, end=None):
+        """Return a Series with the readings of ``host`` in [start, end).
+
+        Each segment is mapped, the matching rows are found by binary search
+        on the timestamps and copied out in one piece. Segments written with
+        other fields are skipped.
+        """
+        data = array.array("d")
+        for path in self.segments(host, start, end):
+            segment = Segment(path)
+            try:
+                if segment.fields != self.fields:
+                    continue
+                rows = segment.select(start, end)
+                with rows, rows.cast("B") as raw:
+                    data.frombytes(raw)
+            finally:
+                segment.close()
+
+        try:
+            # only imported here, recording does not need it
+            import numpy
+        except ImportError:
+            return Series(self.fields, data)
+        data = numpy.frombuffer(data, dtype="d").reshape(-1, len(self.fields) + 1)
+        return Series(self.fields, data)
@@ -0,0 +1,113 @@
+"""Device registry."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import threading
+import time
+
+from pyairctrl import json_codec
+from pyairctrl.ssdp import discover, fetch_description
+
+DEVICE_FIELDS = ["ip", "modelName", "modelNumber", "friendlyName"]
+
+
+class DeviceRegistry:
+    """Devices found by SSDP discovery and their UPnP descriptions.
+
+    A device is remembered with its ip, model, name and the time it was
+    last seen; ``devices`` only returns it for ``ttl`` seconds after that.
+    Descriptions are cached by their LOCATION URL for ``description_ttl``
+    seconds, so a new discovery only downloads the descriptions of devices
+    it has not seen before. With a ``keystore`` the registry is saved in it
+    and shared by all airctrl runs, without one it lives in memory only.
+    """
+
+    def __init__(self, keystore=None, ttl=3600.0, description_ttl=86400.0):
+        self.keystore = keystore
+        self.ttl = ttl
+        self.description_ttl = description_ttl
+        self._lock = threading.Lock()
+        self._devices = None
+        self._descriptions = None
+
+    def _load(self):
+        # called with the lock held
+        if self._devices is not None:
+            return
+        self._devices, self._descriptions = {}, {}
+        if self.keystore is not None:
+            for ip, value in self.keystore.items("devices").items():
+                self._devices[ip] = json_codec.loads(value)
+            for url, value in self.keystore.items("descriptions").items():
+                self._descriptions[url] = json_codec.loads(value)
+
+    def _save(self, section, entries):
+        if self.keystore is not None and entries:
+            self.keystore.set_many(
+                section, {k: json_codec.dumps(v) for k, v in entries.items()}
+            )
+
+    def devices(self, now=None):
+        """Return the devices seen within the last ``ttl`` seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()
+            devices = [
+                d for d in self._devices.values() if now - d["last_seen"] < self.ttl
+            ]
+        return [
+            {k: d.get(k) for k in DEVICE_FIELDS if d.get(k) is not None}
+            for d in sorted(devices, key=lambda d: d["ip"])
+        ]
+
+    def update(self, device, now=None):
+        """Record that ``device`` (a dict with at least "ip") was seen."""
+        entry = dict(device, last_seen=time.time() if now is None else now)
+        with self._lock:
+            self._load()
+            self._devices[entry["ip"]] = entry
+        self._save("devices", {entry["ip"]: entry})
+
+    def remove(self, ip):
+        with self._lock:
+            self._load()
+            self._devices.pop(ip, None)
+        if self.keystore is not None:
+            self.keystore.delete("devices", ip)
+
+    def description(self, url, timeout=2.0, fetch=fetch_description):
+        """Return the description at ``url``, from the cache when possible."""
+        now = time.time()
+        with self._lock:
+            self._load()
+            cached = self._descriptions.get(url)
+        if cached is not None and now - cached["fetched_at"] < self.description_ttl:
+            return cached["description"]
+        description = fetch(url, timeout)
+        entry = {"description": description, "fetched_at": now}
+        with self._lock:
+            self._descriptions[url] = entry
+        self._save("descriptions", {url: entry})
+        return description
+
+    def refresh(self, timeout=1, repeats=3, fetch=fetch_description, **kwargs):
+        """Run an SSDP discovery and remember all devices which answered."""
+
+        def cached_fetch(url, fetch_timeout):
+            return self.description(url, fetch_timeout, fetch)
+
+        now = time.time()
+        found = list(discover(timeout, repeats, fetch=cached_fetch, **kwargs))
+        entries = {}
+        with self._lock:
+            self._load()
+            for device in found:
+                entries[device["ip"]] = dict(device, last_seen=now)
+            self._devices.update(entries)
+        self._save("devices", entries)
+        return found
+
+    def lookup(self, refresh=False, **kwargs):
+        """Return the known devices and only discover them when none are fresh."""
+        devices = [] if refresh else self.devices()
+        return devices or self.refresh(**kwargs)
@@ -0,0 +1,120 @@
+"""Retry policy."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import http.client
+import random
+import time
+import urllib.error
+
+TRANSPORT = "transport"
+KEY = "key"
+BUSY = "busy"
+
+
+class RetryPolicy:
+    """Decides how a failed HTTP request to a device is retried.
+
+    Failures are classified as:
+
+    - key: the response could not be decrypted (bad padding, garbage JSON)
+      or the device rejected the encrypted body with one of
+      ``key_statuses``. A new session key is exchanged, at most once per
+      request, and the request is repeated at once.
+    - busy: the device answered with one of ``busy_statuses``. The request
+      is repeated after ``busy_backoff`` seconds or the Retry-After header.
+    - transport: timeouts, refused or reset connections. The request is
+      repeated after an exponential backoff starting at ``backoff`` seconds.
+
+    Waits are capped at ``max_backoff`` and shortened by a random part of up
+    to ``jitter``, so many clients do not retry in lock step. Other errors
+    are raised at once, and no request is tried more than ``attempts`` times.
+    With a ``budget`` no retry is started which would begin more than
+    ``budget`` seconds after the first try.
+    """
+
+    def __init__(
+        self,
+        attempts=3,
+        backoff=0.1,
+        busy_backoff=1.0,
+        max_backoff=5.0,
+        jitter=0.5,
+        key_statuses=(400, 401, 403),
+        busy_statuses=(429, 503),
+        sleep=time.sleep,
+        budget=None,
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.busy_backoff = busy_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.key_statuses = key_statuses
+        self.busy_statuses = busy_statuses
+        self.sleep = sleep
+        self.budget = budget
+
+    def classify(self, error):
+        if isinstance(error, urllib.error.HTTPError):
+            if error.code in self.key_statuses:
+                return KEY
+            if error.code in self.busy_statuses:
+                return BUSY
+            return None
+        # also covers binascii.Error, UnicodeDecodeError and JSON errors
+        if isinstance(error, ValueError):
+            return KEY
+        if isinstance(error, (OSError, http.client.HTTPException)):
+            return TRANSPORT
+        return None
+
+    def delay(self, kind, attempt, error=None):
+        """Return the seconds to wait before retry number ``attempt`` (from 0)."""
+        if kind == KEY:
+            return 0.0
+        if kind == BUSY:
+            delay = self.busy_backoff
+            headers = getattr(error, "headers", None)
+            retry_after = headers.get("Retry-After") if headers else None
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+        else:
+            delay = self.backoff * 2 ** attempt
+        delay = min(delay, self.max_backoff)
+        return delay * (1.0 - self.jitter * random.random())
+
+    def call(self, request_once, rekey, debug=False):
+        """Return the result of ``request_once()``, retrying as classified."""
+        rekeyed = False
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            try:
+                return request_once()
+            except Exception as e:
+                kind = self.classify(e)
+                attempt += 1
+                if (
+                    kind is None
+                    or attempt >= self.attempts
+                    or (kind == KEY and rekeyed)
+                ):
+                    raise
+                if debug:
+                    print("Request error: {}".format(str(e)))
+                delay = self.delay(kind, attempt - 1, e)
+                if (
+                    self.budget is not None
+                    and time.monotonic() - started + delay > self.budget
+                ):
+                    raise
+                if kind == KEY:
+                    if debug:
+                        print("Will retry after getting a new key ...")
+                    rekey()
+                    rekeyed = True
+                else:
+                    if debug:
+                        print("Will retry in {:.2f} s ...".format(delay))
+                    self.sleep(delay)
@@ -0,0 +1,54 @@
+"""Status snapshot cache."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import threading
+import time
+
+
+class SnapshotCache:
+    """The last status document of one device, kept for ``ttl`` seconds.
+
+    CoAP devices only have one status document, so status, filters and
+    firmware can all be served from the same fetch. A ``ttl`` of 0 disables
+    the cache. Empty documents, which the clients return on errors, are
+    never cached. The cached document is shared, callers must not modify it.
+    """
+
+    def __init__(self, ttl=0.0, invalidate_on_set=False):
+        self.ttl = ttl
+        self.invalidate_on_set = invalidate_on_set
+        self._snapshot = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def lookup(self):
+        with self._lock:
+            if (
+                self._snapshot is None
+                or time.monotonic() - self._fetched_at >= self.ttl
+            ):
+                return None
+            return self._snapshot
+
+    def store(self, snapshot):
+        if self.ttl > 0 and snapshot:
+            with self._lock:
+                self._snapshot = snapshot
+                self._fetched_at = time.monotonic()
+        return snapshot
+
+    def get(self, fetch):
+        snapshot = self.lookup()
+        if snapshot is None:
+            snapshot = self.store(fetch())
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._fetched_at = None
+
+    def values_set(self):
+        if self.invalidate_on_set:
+            self.invalidate()
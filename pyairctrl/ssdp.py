@@ -0,0 +1,249 @@
+"""SSDP discovery."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import queue
+import socket
+import struct
+import threading
+import time
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+MULTICAST_ADDR = "239.255.255.250"
+MULTICAST_PORT = 1900
+SEARCH_TARGET = "urn:philips-com:device:DiProduct:1"
+DESCRIPTION_FIELDS = ["modelName", "modelNumber", "friendlyName"]
+
+_NS = {"urn": "urn:schemas-upnp-org:device-1-0"}
+# how often pending description fetches are checked while searching
+_POLL_INTERVAL = 0.05
+
+
+def search_message(addr=MULTICAST_ADDR, port=MULTICAST_PORT):
+    return "\r\n".join(
+        [
+            "M-SEARCH * HTTP/1.1",
+            "HOST: {}:{}".format(addr, port),
+            "ST: " + SEARCH_TARGET,
+            "MX: 1",
+            'MAN: "ssdp:discover"',
+            "",
+            "",
+        ]
+    ).encode("ascii")
+
+
+def parse_headers(data):
+    """Return the start line and the upper case headers of an SSDP message."""
+    lines = data.decode("ascii", "replace").splitlines()
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().upper()] = value.strip()
+    return (lines[0] if lines else ""), headers
+
+
+def parse_description(document):
+    """Return the model and name fields of a UPnP device description."""
+    xml = ET.fromstring(document)
+    description = {}
+    for d in xml.findall("urn:device", _NS):
+        for t in DESCRIPTION_FIELDS:
+            description[t] = d.findtext("urn:" + t, None, _NS)
+    return description
+
+
+def fetch_description(url, timeout=2.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return parse_description(response.read())
+
+
+def _open_socket():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        # SO_REUSEPORT is not supported on some systems
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    s.setsockopt(socket.SOL_IP, socket.IP_MULTICAST_TTL, 20)
+    return s
+
+
+def discover(
+    timeout=1,
+    repeats=3,
+    fetch_timeout=2.0,
+    concurrency=16,
+    fetch=fetch_description,
+    target=(MULTICAST_ADDR, MULTICAST_PORT),
+):
+    """Search for devices and yield each one as soon as it is described.
+
+    Like before, the M-SEARCH is repeated up to ``repeats`` times until a
+    search window of ``timeout`` seconds got an answer. The description of
+    a device is fetched as soon as its first answer arrives, on a pool of
+    ``concurrency`` threads and with ``fetch_timeout`` seconds per fetch, so
+    slow devices neither hold back the search nor each other. A device
+    whose description cannot be fetched is yielded with its ip only.
+    """
+    done = queue.Queue()
+    pending = 0
+
+    def described(ip, future):
+        try:
+            description = future.result()
+        except Exception:
+            description = {}
+        device = {"ip": ip}
+        device.update(description)
+        done.put(device)
+
+    seen = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor, _open_socket() as s:
+        msg = search_message(*target)
+        for _ in range(repeats):
+            s.sendto(msg, target)
+            deadline = time.monotonic() + timeout
+            while True:
+                while not done.empty():
+                    pending -= 1
+                    yield done.get()
+                # wait for answers in short slices to yield finished fetches
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                s.settimeout(min(remaining, _POLL_INTERVAL))
+                try:
+                    data, (ip, _) = s.recvfrom(1024)
+                except socket.timeout:
+                    continue
+                # an answer keeps the window open, like the blocking search did
+                deadline = time.monotonic() + timeout
+                location = parse_headers(data)[1].get("LOCATION")
+                if location is None or ip in seen:
+                    continue
+                seen.add(ip)
+                pending += 1
+                future = executor.submit(fetch, location, fetch_timeout)
+                future.add_done_callback(lambda f, ip=ip: described(ip, f))
+            if seen:
+                break
+
+        while pending:
+            pending -= 1
+            yield done.get()
+
+
+class NotifyListener:
+    """Keeps a DeviceRegistry current from the NOTIFY messages of devices.
+
+    The listener joins the SSDP multicast group and sends nothing itself.
+    ``ssdp:alive`` messages of DiProduct devices add or refresh a device,
+    ``ssdp:byebye`` removes it. Devices are tracked by their USN, so when a
+    device comes back with another ip the old ip is removed at once.
+    Descriptions are fetched through the registry's cache on a small thread
+    pool, so a burst of announcements never blocks the socket.
+    """
+
+    def __init__(
+        self,
+        registry,
+        fetch_timeout=2.0,
+        fetch=fetch_description,
+        interface="0.0.0.0",
+        group=MULTICAST_ADDR,
+        port=MULTICAST_PORT,
+    ):
+        self.registry = registry
+        self.fetch_timeout = fetch_timeout
+        self.fetch = fetch
+        self.interface = interface
+        self.group = group
+        self.port = port
+        self.address = None
+        self._usns = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        self._socket = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def open(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            # SO_REUSEPORT is not supported on some systems
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        s.bind(("", self.port))
+        membership = struct.pack(
+            "4s4s", socket.inet_aton(self.group), socket.inet_aton(self.interface)
+        )
+        s.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        # wake up now and then to notice stop()
+        s.settimeout(0.5)
+        self._socket = s
+        self.address = s.getsockname()
+
+    def handle(self, data, ip):
+        """Process one datagram, return the future of a description fetch."""
+        start, headers = parse_headers(data)
+        if not start.startswith("NOTIFY") or headers.get("NT") != SEARCH_TARGET:
+            return None
+        usn = headers.get("USN", ip)
+        kind = headers.get("NTS")
+        with self._lock:
+            previous = self._usns.get(usn)
+            if kind == "ssdp:byebye":
+                self._usns.pop(usn, None)
+            elif kind == "ssdp:alive":
+                self._usns[usn] = ip
+        if kind == "ssdp:byebye":
+            self.registry.remove(previous or ip)
+            return None
+        if kind != "ssdp:alive":
+            return None
+        if previous is not None and previous != ip:
+            self.registry.remove(previous)
+        return self._executor.submit(self._describe, ip, headers.get("LOCATION"))
+
+    def _describe(self, ip, location):
+        device = {"ip": ip}
+        if location is not None:
+            try:
+                device.update(
+                    self.registry.description(location, self.fetch_timeout, self.fetch)
+                )
+            except Exception:
+                pass
+        self.registry.update(device)
+
+    def serve_forever(self):
+        if self._socket is None:
+            self.open()
+        while not self._stopped.is_set():
+            try:
+                data, (ip, _) = self._socket.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stopped.is_set():
+                    break
+                raise
+            self.handle(data, ip)
+
+    def start(self):
+        if self._socket is None:
+            self.open()
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._socket is not None:
+            self._socket.close()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,88 @@
+"""Status renderer."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import functools
+
+from pyairctrl.status_transformer import STATUS_TRANSFORMER
+
+TAB_SIZE = 30
+
+
+class RenderPlan:
+    """STATUS_TRANSFORMER compiled for one subset of keys.
+
+    The key prefixes are tab expanded once, and every known key maps straight
+    to its bound ``str.format`` and transformation, so rendering a status is
+    one dict lookup and one format call per key. Unknown keys are only shown
+    when no subset is selected.
+    """
+
+    def __init__(self, subset=None, print_key=True):
+        self.subset = subset
+        self.print_key = print_key
+        self._entries = {}
+        for key, (template, key_subset, transform) in STATUS_TRANSFORMER.items():
+            if subset is not None and subset != key_subset:
+                # known keys outside the subset are skipped
+                self._entries[key] = None
+            else:
+                self._entries[key] = self._entry(key, template, transform)
+        self._unknown = {}
+
+    def _entry(self, key, template, transform):
+        prefix = "[{}]\t".format(key) if self.print_key else ""
+        return (prefix.expandtabs(TAB_SIZE), prefix, template.format, transform)
+
+    def _unknown_entry(self, key):
+        entry = self._unknown.get(key)
+        if entry is None:
+            template = key.replace("{", "{{").replace("}", "}}") + ": {}"
+            entry = self._entry(key, template, None)
+            if len(self._unknown) < 256:
+                self._unknown[key] = entry
+        return entry
+
+    def lines(self, status):
+        entries = self._entries
+        show_unknown = self.subset is None
+        for key in status:
+            if key in entries:
+                entry = entries[key]
+                if entry is None:
+                    continue
+            elif show_unknown:
+                entry = self._unknown_entry(key)
+            else:
+                continue
+
+            prefix, raw_prefix, render, transform = entry
+            value = status[key]
+            if transform is not None:
+                value = transform(value)
+                if value is None:
+                    continue
+            text = render(value)
+            if "\t" in text:
+                # tabs in the value are expanded relative to the whole line
+                yield (raw_prefix + text).expandtabs(TAB_SIZE)
+            else:
+                yield prefix + text
+
+    def render(self, status):
+        """Return the status as one string, ready for a single write."""
+        text = "\n".join(self.lines(status))
+        return text + "\n" if text else ""
+
+    def render_many(self, statuses):
+        """Render (header, status) pairs, e.g. a whole fleet, as one string."""
+        parts = []
+        for header, status in statuses:
+            parts.append("[{}]\n".format(header))
+            parts.append(self.render(status))
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def render_plan(subset=None, print_key=True):
+    return RenderPlan(subset, print_key)
@@ -0,0 +1,48 @@
+"""Control write batching."""
+
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+from collections import OrderedDict
+
+
+class WriteBatching:
+    """Whether a device accepts several control values in one write.
+
+    Unknown at first, so values are sent together and only sent one key at
+    a time when that write fails. Writes return True when the device
+    accepted them, False when it rejected them and None when it did not
+    answer. Batching is only turned off once the device rejected a batch
+    whose keys it then accepted one by one; a batch lost to a timeout says
+    nothing about the firmware, so the next write tries a batch again.
+    """
+
+    def __init__(self):
+        self.supported = None
+
+    def should_batch(self, values):
+        return len(values) > 1 and self.supported is not False
+
+    def batch_written(self, accepted):
+        """Record the result of a batch, return whether it applied all values."""
+        if accepted:
+            self.supported = True
+        return bool(accepted)
+
+    def keys_written(self, batch, results):
+        """Record the results of the single key writes after ``batch``."""
+        if batch is False and self.supported is None and all(results.values()):
+            # every key works on its own, so the firmware rejects multi-key writes
+            self.supported = False
+
+    def write(self, values, write_batch, write_key):
+        """Apply ``values`` and return whether each key was applied."""
+        batch = None
+        if self.should_batch(values):
+            batch = write_batch(values)
+            if self.batch_written(batch):
+                return OrderedDict((key, True) for key in values)
+        results = OrderedDict()
+        for key in values:
+            results[key] = bool(write_key(key, values[key]))
+        self.keys_written(batch, results)
+        return results
@@ -1,8 +1,8 @@
 import setuptools
 import sys
 
-if sys.version_info < (3,4):
-    sys.exit("Python 3.4 or newer is required.")
+if sys.version_info < (3,6):
+    sys.exit("Python 3.6 or newer is required.")
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -17,6 +17,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/rgerganov/py-air-control",
     packages=['pyairctrl'],
+    python_requires='>=3.6',
     install_requires=[
         'pycryptodomex>=3.4.7',
         'CoAPthon3>=1.0.1'
@@ -25,6 +26,7 @@ setuptools.setup(
         'console_scripts': [
             'airctrl=pyairctrl.airctrl:main',
             'cloudctrl=pyairctrl.cloudctrl:main',
+            'airctrl-exporter=pyairctrl.exporter:main',
         ],
     },
     classifiers=[
@@ -0,0 +1,189 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import os
+import json
+import socket
+import asyncio
+import pytest
+from pyairctrl.async_coap_client import AsyncCoAPAirClient
+from coap_test_server import CoAPTestServer
+from coap_resources import SyncResource, ControlResource, StatusResource
+
+
+class TestAsyncCoap:
+    @pytest.fixture(scope="class")
+    def test_data(self):
+        return self._test_data()
+
+    def _test_data(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dir_path, "data.json"), "r") as json_file:
+            return json.load(json_file)
+
+    @pytest.fixture(scope="class")
+    def sync_resource(self):
+        return SyncResource()
+
+    @pytest.fixture(scope="class")
+    def status_resource(self):
+        return StatusResource()
+
+    @pytest.fixture(scope="class")
+    def control_resource(self):
+        return ControlResource()
+
+    @pytest.fixture(autouse=True)
+    def set_defaults(self, control_resource, status_resource):
+        control_resource.set_data(
+            '{"CommandType": "app", "DeviceId": "", "EnduserId": "", "mode": "A"}'
+        )
+        status_resource.set_dataset("status")
+        status_resource.set_render_callback(None)
+
+    @pytest.fixture(scope="class", autouse=True)
+    def coap_server(self, sync_resource, status_resource, control_resource):
+        server = CoAPTestServer(5683)
+        server.add_url_rule("/sys/dev/status", status_resource)
+        server.add_url_rule("/sys/dev/control", control_resource)
+        server.add_url_rule("/sys/dev/sync", sync_resource)
+        server.start()
+        yield server
+        server.stop()
+
+    def run(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    async def connect(self, sync_resource, status_resource):
+        client = AsyncCoAPAirClient("127.0.0.1", timeout=5)
+        await client.connect()
+        status_resource.set_encryption_key(sync_resource.encryption_key)
+        return client
+
+    def test_sync_was_called(self, sync_resource, status_resource):
+        async def sync():
+            client = await self.connect(sync_resource, status_resource)
+            client.close()
+            return client.client_key
+
+        assert self.run(sync()) == SyncResource.SYNC_KEY
+
+    def test_set_values(self, sync_resource, status_resource, control_resource):
+        async def set_values():
+            client = await self.connect(sync_resource, status_resource)
+            try:
+                return await client.set_values({"mode": "A"})
+            finally:
+                client.close()
+
+        assert self.run(set_values())
+        assert (
+            int(control_resource.encoded_counter, 16)
+            == int(SyncResource.SYNC_KEY, 16) + 1
+        )
+
+    def test_set_values_batch_falls_back_to_single_keys(
+        self, sync_resource, status_resource, control_resource
+    ):
+        async def set_values():
+            client = await self.connect(sync_resource, status_resource)
+            try:
+                result = await client.set_values_batch({"mode": "A", "om": "2"})
+                return result, client._batching.supported
+            finally:
+                client.close()
+
+        assert self.run(set_values()) == ({"mode": True, "om": False}, None)
+        assert (
+            int(control_resource.encoded_counter, 16)
+            == int(SyncResource.SYNC_KEY, 16) + 3
+        )
+
+    def test_get_status_is_valid(self, sync_resource, status_resource, test_data):
+        self.assert_status("status", test_data, sync_resource, status_resource)
+
+    def test_get_status_longsize_is_valid(
+        self, sync_resource, status_resource, test_data
+    ):
+        dataset = "status-longsize"
+        status_resource.set_dataset(dataset)
+        self.assert_status(dataset, test_data, sync_resource, status_resource)
+
+    def test_response_is_cut_off_should_return_error(
+        self, sync_resource, status_resource, capfd
+    ):
+        async def get_status():
+            client = await self.connect(sync_resource, status_resource)
+            status_resource.set_render_callback(lambda data: data[:-8])
+            try:
+                return await client.get_status()
+            finally:
+                client.close()
+
+        assert self.run(get_status()) == {}
+        result, err = capfd.readouterr()
+        assert "Message from device got corrupted" in result
+
+    def test_observe_status_yields_every_notification(
+        self, sync_resource, status_resource, coap_server, test_data
+    ):
+        async def observe():
+            client = await self.connect(sync_resource, status_resource)
+            updates = []
+            try:
+                async for status in client.observe_status():
+                    updates.append(status)
+                    if len(updates) == 2:
+                        break
+                    status_resource.set_dataset("status-err193")
+                    coap_server.coap_server.notify(status_resource)
+            finally:
+                client.close()
+            return updates
+
+        first, second = self.run(observe())
+        assert first == json.loads(test_data["coap"]["status"]["data"])
+        assert second == json.loads(test_data["coap"]["status-err193"]["data"])
+
+    def test_many_clients_share_one_loop(
+        self, sync_resource, status_resource, test_data
+    ):
+        async def get_status(client):
+            try:
+                return await client.get_status()
+            finally:
+                client.close()
+
+        async def poll_all():
+            clients = [
+                await self.connect(sync_resource, status_resource) for _ in range(10)
+            ]
+            return await asyncio.gather(*[get_status(c) for c in clients])
+
+        expected = json.loads(test_data["coap"]["status"]["data"])
+        assert self.run(poll_all()) == [expected] * 10
+
+    def test_cancelled_connect_closes_the_transport(self):
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(("127.0.0.1", 0))
+        client = AsyncCoAPAirClient("127.0.0.1", silent.getsockname()[1], timeout=5)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                self.run(asyncio.wait_for(client.connect(), 0.2))
+        finally:
+            silent.close()
+        assert client._transport is None
+
+    def assert_status(self, dataset, test_data, sync_resource, status_resource):
+        async def get_status():
+            client = await self.connect(sync_resource, status_resource)
+            try:
+                return await client.get_status()
+            finally:
+                client.close()
+
+        result = self.run(get_status())
+        assert result == json.loads(test_data["coap"][dataset]["data"])
@@ -0,0 +1,18 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import pytest
+from pyairctrl.clients import create_client
+from pyairctrl.http_client import HTTPAirClient, KeepAliveTransport
+
+
+class TestCreateClient:
+    def test_http_client_shares_transport(self):
+        transport = KeepAliveTransport()
+        client = create_client("http", "127.0.0.1", transport)
+        assert isinstance(client, HTTPAirClient)
+        assert client._transport is transport
+        assert client._optimistic
+
+    def test_unknown_protocol(self):
+        with pytest.raises(ValueError):
+            create_client("mqtt", "127.0.0.1")
@@ -77,6 +77,35 @@ class TestCoap:
             == int(SyncResource.SYNC_KEY, 16) + 1
         )
 
+    def test_set_values_batch_uses_single_write(self, control_resource):
+        control_resource.set_data(
+            '{"CommandType": "app", "DeviceId": "", "EnduserId": "", "mode": "M", "om": "2"}'
+        )
+        air_client = CoAPAirClient("127.0.0.1")
+        result = air_client.set_values_batch({"mode": "M", "om": "2"})
+        assert result == {"mode": True, "om": True}
+        assert (
+            int(control_resource.encoded_counter, 16)
+            == int(SyncResource.SYNC_KEY, 16) + 1
+        )
+
+    def test_set_values_batch_falls_back_to_single_keys(self, control_resource):
+        air_client = CoAPAirClient("127.0.0.1")
+        result = air_client.set_values_batch({"mode": "A", "om": "2"})
+        assert result == {"mode": True, "om": False}
+        # the batch and one write per key
+        assert (
+            int(control_resource.encoded_counter, 16)
+            == int(SyncResource.SYNC_KEY, 16) + 3
+        )
+        # a key was rejected on its own too, so batching stays worth a try
+        assert air_client._batching.supported is None
+        assert not air_client.set_values({"mode": "A", "om": "2"})
+        assert (
+            int(control_resource.encoded_counter, 16)
+            == int(SyncResource.SYNC_KEY, 16) + 6
+        )
+
     def test_response_is_cut_off_should_return_error(self, status_resource, capfd):
         air_client = CoAPAirClient("127.0.0.1")
         status_resource.set_render_callback(self.cutoff_data)
@@ -87,6 +116,33 @@ class TestCoap:
     def cutoff_data(self, data):
         return data[:-8]
 
+    def count_fetches(self, air_client):
+        fetches = []
+        get = air_client._get
+        air_client._get = lambda: fetches.append(1) or get()
+        return fetches
+
+    def test_snapshot_serves_all_views_from_one_fetch(self, status_resource):
+        status_resource.set_encryption_key(SyncResource.SYNC_KEY)
+        air_client = CoAPAirClient("127.0.0.1", snapshot_ttl=60)
+        fetches = self.count_fetches(air_client)
+        status = air_client.get_status()
+        assert status
+        assert air_client.get_filters() is status
+        assert air_client.get_firmware() is status
+        assert len(fetches) == 1
+
+    def test_snapshot_is_invalidated_after_set_values(self, status_resource):
+        status_resource.set_encryption_key(SyncResource.SYNC_KEY)
+        air_client = CoAPAirClient(
+            "127.0.0.1", snapshot_ttl=60, invalidate_on_set=True
+        )
+        fetches = self.count_fetches(air_client)
+        air_client.get_status()
+        air_client.set_values({"mode": "A"})
+        air_client.get_status()
+        assert len(fetches) == 2
+
     def test_get_status_is_valid(
         self, sync_resource, status_resource, air_client, test_data
     ):
@@ -137,6 +193,19 @@ class TestCoap:
             status_resource,
         )
 
+    def test_observe_status_yields_every_notification(
+        self, status_resource, coap_server, air_client, test_data
+    ):
+        notifications = air_client.observe_status()
+        first = next(notifications)
+        status_resource.set_dataset("status-err193")
+        coap_server.coap_server.notify(status_resource)
+        second = next(notifications)
+        notifications.close()
+
+        assert first == json.loads(test_data["coap"]["status"]["data"])
+        assert second == json.loads(test_data["coap"]["status-err193"]["data"])
+
     def test_get_cli_status_is_valid(
         self, sync_resource, status_resource, air_cli, test_data, capfd
     ):
@@ -0,0 +1,49 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import json
+import pytest
+from pyairctrl.coap_codec import CoAPCodec, WrongDigestException
+from coap_resources import StatusResource, ControlResource
+
+
+class TestCoAPCodec:
+    COUNTER = "2170B936"
+    PAYLOAD = '{"state":{"desired":{"mode":"A"}}}'
+
+    @pytest.fixture
+    def codec(self):
+        return CoAPCodec()
+
+    def test_decrypts_device_payload(self, codec):
+        resource = StatusResource()
+        resource.set_encryption_key(self.COUNTER)
+        encrypted = resource._encrypt_payload(self.PAYLOAD)
+        assert codec.decrypt(encrypted) == self.PAYLOAD
+        assert codec.decrypt(encrypted.encode("ascii")) == self.PAYLOAD
+
+    def test_device_decrypts_encrypted_payload(self, codec):
+        resource = ControlResource()
+        encrypted = codec.encrypt(self.COUNTER, self.PAYLOAD)
+        assert resource._decrypt_payload(encrypted) == self.PAYLOAD
+        assert resource.encoded_counter == self.COUNTER
+
+    def test_round_trip_of_long_message(self, codec):
+        payload = json.dumps({"name": "x" * 2000})
+        assert codec.decrypt(codec.encrypt(self.COUNTER, payload)) == payload
+
+    def test_lower_case_hex_is_accepted(self, codec):
+        encrypted = codec.encrypt(self.COUNTER, self.PAYLOAD)
+        message = encrypted[:-64]
+        lower_case = message[:8] + message[8:].lower() + encrypted[-64:]
+        assert codec.decrypt(lower_case) == self.PAYLOAD
+
+    def test_cut_off_payload_raises_wrong_digest(self, codec):
+        encrypted = codec.encrypt(self.COUNTER, self.PAYLOAD)
+        with pytest.raises(WrongDigestException):
+            codec.decrypt(encrypted[:-8])
+
+    def test_tampered_message_raises_wrong_digest(self, codec):
+        encrypted = codec.encrypt(self.COUNTER, self.PAYLOAD)
+        tampered = encrypted[:8] + ("0" if encrypted[8] != "0" else "1") + encrypted[9:]
+        with pytest.raises(WrongDigestException):
+            codec.decrypt(tampered)
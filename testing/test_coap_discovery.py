@@ -0,0 +1,104 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import socket
+import threading
+import time
+import pytest
+from coapthon.server.coap import CoAP
+from coap_resources import SyncResource
+from plain_coap_resources import StatusResource
+from pyairctrl.coap_discovery import (
+    GET,
+    POST,
+    decode_response,
+    discover,
+    encode_request,
+)
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestMessages:
+    def test_encode_request(self):
+        message = encode_request(POST, 0x1234, b"\x01\x02", "/sys/dev/sync", b"AB")
+        assert message == (
+            b"\x42\x02\x12\x34\x01\x02"
+            b"\xb3sys\x03dev\x04sync"
+            b"\xffAB"
+        )
+
+    def test_observe_comes_before_path(self):
+        message = encode_request(GET, 1, b"", "/sys/dev/status", observe=0)
+        assert message[4:9] == b"\x60\x53sys"
+
+    def test_long_path_segment(self):
+        message = encode_request(POST, 1, b"", "/" + "x" * 20)
+        assert message[4:6] == bytes([0xBD, 7])
+
+    def test_decode_response(self):
+        data = b"\x61\x45\x12\x34\x07\xc0\xff2170B935"
+        assert decode_response(data) == (2, 0x45, 0x1234, b"\x07", b"2170B935")
+
+    def test_payload_marker_in_option_is_skipped(self):
+        # an Observe option with the value 0xFF
+        data = b"\x61\x45\x12\x34\x07\x61\xff\xff{}"
+        assert decode_response(data)[4] == b"{}"
+
+    def test_decode_garbage(self):
+        assert decode_response(b"\x00\x01") is None
+        assert decode_response(b"\x4f\x45\x00\x01") is None
+
+
+class TestDiscover:
+    @pytest.fixture(scope="class")
+    def servers(self):
+        port = free_port()
+        encrypted = CoAP(("127.0.0.2", port))
+        encrypted.add_resource("sys/dev/sync/", SyncResource())
+        plain = CoAP(("127.0.0.3", port))
+        status = StatusResource()
+        status.set_dataset("status")
+        plain.add_resource("sys/dev/status/", status)
+        # any other CoAP server
+        other = CoAP(("127.0.0.4", port))
+        servers = [encrypted, plain, other]
+        threads = [threading.Thread(target=s.listen, args=(1,)) for s in servers]
+        for thread in threads:
+            thread.start()
+        yield port
+        for server in servers:
+            server.close()
+        for thread in threads:
+            thread.join(5)
+
+    def test_devices_and_protocols_are_found(self, servers):
+        devices = discover("127.0.0.0/29", port=servers, timeout=0.5)
+        assert devices == [
+            {"ip": "127.0.0.2", "protocol": "coap"},
+            {"ip": "127.0.0.3", "protocol": "plain_coap"},
+        ]
+
+    def test_single_address(self, servers):
+        devices = discover("127.0.0.3/32", port=servers, timeout=0.5)
+        assert devices == [{"ip": "127.0.0.3", "protocol": "plain_coap"}]
+
+    def test_without_hello_only_encrypted_devices_are_probed(self, servers):
+        devices = discover("127.0.0.0/29", port=servers, timeout=0.5, hello=False)
+        assert devices == [{"ip": "127.0.0.2", "protocol": "coap"}]
+
+    def test_other_coap_server_is_left_out(self, servers):
+        assert discover("127.0.0.4/32", port=servers, timeout=0.5) == []
+
+    def test_rate_limit(self, servers):
+        start = time.monotonic()
+        discover("127.0.0.0/29", port=servers, timeout=0.1, rate=40.0)
+        # 6 hosts with a hello and 2 probes each
+        assert time.monotonic() - start >= 17 / 40.0
+
+    def test_too_large_network(self):
+        with pytest.raises(ValueError):
+            discover("10.0.0.0/8")
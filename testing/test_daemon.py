@@ -0,0 +1,175 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from pyairctrl.airctrl import HTTPAirCli
+from pyairctrl.daemon import (
+    DaemonAirClient,
+    DaemonClient,
+    DaemonError,
+    GatewayServer,
+    SessionPool,
+    connect_daemon,
+)
+
+
+class FakeClient:
+    def __init__(self):
+        self.status = {"pwr": "1", "pm25": 4}
+        self.calls = 0
+        self.closed = False
+
+    def get_status(self, debug=False):
+        self.calls += 1
+        if isinstance(self.status, Exception):
+            raise self.status
+        return self.status
+
+    def set_values(self, values, debug=False):
+        self.status = dict(self.status, **values)
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(SessionPool):
+    def __init__(self):
+        super().__init__()
+        self.created = []
+
+    def _create_client(self, protocol, host):
+        client = FakeClient()
+        self.created.append((protocol, host, client))
+        return client
+
+
+@pytest.fixture
+def pool():
+    pool = FakePool()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def server(tmp_path, pool):
+    server = GatewayServer(str(tmp_path / "airctrl.sock"), pool)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def daemon(server):
+    daemon = DaemonClient(server.path)
+    yield daemon
+    daemon.close()
+
+
+class TestSessionPool:
+    def test_client_is_kept_between_calls(self, pool):
+        pool.call("http", "h", "status")
+        pool.call("http", "h", "status")
+        assert len(pool.created) == 1
+        assert pool.created[0][2].calls == 2
+
+    def test_protocols_have_separate_sessions(self, pool):
+        pool.call("http", "h", "status")
+        pool.call("plain_coap", "h", "status")
+        assert [c[0] for c in pool.created] == ["http", "plain_coap"]
+
+    def test_failed_client_is_dropped(self, pool):
+        pool.call("http", "h", "status")
+        client = pool.created[0][2]
+        client.status = ConnectionError("refused")
+        with pytest.raises(ConnectionError):
+            pool.call("http", "h", "status")
+        assert client.closed
+        assert pool.call("http", "h", "status") == {"pwr": "1", "pm25": 4}
+        assert len(pool.created) == 2
+
+    def test_empty_result_drops_client(self, pool):
+        pool.call("http", "h", "status")
+        client = pool.created[0][2]
+        client.status = {}
+        assert pool.call("http", "h", "status") == {}
+        assert client.closed
+        pool.call("http", "h", "status")
+        assert len(pool.created) == 2
+
+    def test_unsupported_operation_keeps_client(self, pool):
+        with pytest.raises(DaemonError):
+            pool.call("http", "h", "wifi")
+        assert not pool.created[0][2].closed
+
+    def test_keep_alive_refreshes_idle_sessions(self, pool):
+        pool.call("http", "h", "status")
+        pool.keep_alive(60.0)
+        assert pool.created[0][2].calls == 1
+        pool.keep_alive(0.0)
+        assert pool.created[0][2].calls == 2
+
+
+class TestGateway:
+    def test_status_is_forwarded(self, daemon):
+        assert daemon.call("http", "h", "status") == {"pwr": "1", "pm25": 4}
+
+    def test_set_values_is_forwarded(self, daemon):
+        assert daemon.call("http", "h", "set", [{"pwr": "0"}])
+        assert daemon.call("http", "h", "status")["pwr"] == "0"
+
+    def test_errors_are_raised_in_client(self, daemon, pool):
+        daemon.call("http", "h", "status")
+        pool.created[0][2].status = ConnectionError("refused")
+        with pytest.raises(DaemonError, match="refused"):
+            daemon.call("http", "h", "status")
+
+    def test_cli_uses_daemon(self, daemon, capfd):
+        client = DaemonAirClient(daemon, "h", "http")
+        HTTPAirCli("h", client=client).get_status()
+        assert "PM25: 4" in capfd.readouterr().out
+
+    def test_round_trip_is_fast(self, daemon):
+        daemon.call("http", "h", "status")
+        start = time.monotonic()
+        for _ in range(100):
+            daemon.call("http", "h", "status")
+        assert (time.monotonic() - start) / 100 < 0.01
+
+    def test_socket_is_private(self, server):
+        assert os.stat(server.path).st_mode & 0o777 == 0o600
+
+    def test_second_daemon_is_refused(self, server):
+        with pytest.raises(DaemonError):
+            GatewayServer(server.path, SessionPool())
+
+
+class TestConnectDaemon:
+    def test_missing_socket(self, tmp_path):
+        assert connect_daemon(str(tmp_path / "missing.sock")) is None
+
+    def test_stale_socket_is_replaced(self, tmp_path, pool):
+        path = str(tmp_path / "airctrl.sock")
+        GatewayServer(path, pool).socket.close()
+        assert os.path.exists(path)
+        assert connect_daemon(path) is None
+        server = GatewayServer(path, pool)
+        server.server_close()
+        assert not os.path.exists(path)
+
+    def test_airctrl_leaves_device_stacks_to_the_daemon(self):
+        stacks = ["http_client", "coap_client", "plain_coap_client", "fleet"]
+        stacks += ["recorder", "numpy"]
+        code = "import sys, pyairctrl.airctrl; print(' '.join(sys.modules))"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        modules = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=root, universal_newlines=True
+        ).split()
+        assert not [m for m in modules if m.split(".")[-1] in stacks]
@@ -0,0 +1,71 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import itertools
+import pytest
+from pyairctrl.delta import DeltaTracker, parse_deadbands, poll_changes
+
+
+class FakeClient:
+    def __init__(self, statuses):
+        self.statuses = iter(statuses)
+
+    def get_status(self):
+        return next(self.statuses)
+
+
+class TestDeltaTracker:
+    def test_first_status_is_reported_in_full(self):
+        status = {"pwr": "1", "pm25": 4}
+        assert DeltaTracker().update("h", status) == status
+
+    def test_only_changed_keys_are_reported(self):
+        tracker = DeltaTracker()
+        tracker.update("h", {"pwr": "1", "pm25": 4, "mode": "A"})
+        assert tracker.update("h", {"pwr": "1", "pm25": 5, "mode": "A"}) == {
+            "pm25": 5
+        }
+        assert tracker.update("h", {"pwr": "1", "pm25": 5, "mode": "A"}) == {}
+
+    def test_devices_are_tracked_separately(self):
+        tracker = DeltaTracker()
+        tracker.update("a", {"pm25": 4})
+        assert tracker.update("b", {"pm25": 4}) == {"pm25": 4}
+
+    def test_type_change_is_reported(self):
+        tracker = DeltaTracker()
+        tracker.update("h", {"cl": False})
+        assert tracker.update("h", {"cl": 0}) == {"cl": 0}
+
+    def test_deadband_accumulates_drift(self):
+        tracker = DeltaTracker({"pm25": 3})
+        tracker.update("h", {"pm25": 10})
+        assert tracker.update("h", {"pm25": 12}) == {}
+        assert tracker.update("h", {"pm25": 13}) == {"pm25": 13}
+        assert tracker.update("h", {"pm25": 11}) == {}
+
+    def test_deadband_ignores_strings(self):
+        tracker = DeltaTracker({"mode": 5})
+        tracker.update("h", {"mode": "A"})
+        assert tracker.update("h", {"mode": "M"}) == {"mode": "M"}
+
+    def test_repeated_error_is_reported_once(self):
+        tracker = DeltaTracker()
+        assert tracker.update_error("h", "timeout")
+        assert not tracker.update_error("h", "timeout")
+        tracker.update("h", {"pwr": "1"})
+        assert tracker.update_error("h", "timeout")
+
+
+class TestPollChanges:
+    def test_yields_only_changes(self):
+        client = FakeClient(
+            [{"pm25": 4}, {"pm25": 4}, {}, {"pm25": 5}, {"pm25": 5}, {"pm25": 6}]
+        )
+        changes = list(itertools.islice(poll_changes(client, interval=0), 3))
+        assert changes == [{"pm25": 4}, {"pm25": 5}, {"pm25": 6}]
+
+    def test_parse_deadbands(self):
+        assert parse_deadbands(["pm25=2", "rh=0.5"]) == {"pm25": 2.0, "rh": 0.5}
+        assert parse_deadbands(None) == {}
+        with pytest.raises(ValueError):
+            parse_deadbands(["pm25"])
@@ -0,0 +1,54 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import os
+import json
+import pickle
+import pytest
+from pyairctrl.device_status import DeviceStatus
+
+
+class TestDeviceStatus:
+    @pytest.fixture(scope="class")
+    def status(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dir_path, "data.json"), "r") as json_file:
+            test_data = json.load(json_file)
+        return json.loads(test_data["coap"]["status"]["data"])
+
+    def test_behaves_like_the_dict(self, status):
+        record = DeviceStatus(status)
+        assert record == status
+        assert list(record) == list(status)
+        assert len(record) == len(status)
+        assert record["pwr"] == status["pwr"]
+        assert record.get("missing") is None
+        assert "missing" not in record
+
+    def test_to_dict_keeps_device_order(self, status):
+        reversed_status = dict(reversed(list(status.items())))
+        assert list(DeviceStatus(reversed_status).to_dict()) == list(reversed_status)
+
+    def test_known_fields_are_attributes(self, status):
+        record = DeviceStatus(status)
+        assert record.pm25 == status["pm25"]
+        with pytest.raises(AttributeError):
+            record.pm25 = 0
+
+    def test_unknown_keys_overflow(self):
+        record = DeviceStatus({"pwr": "1", "newkey": 7})
+        assert record["newkey"] == 7
+        assert "newkey" in record
+        assert "pm25" not in record
+        with pytest.raises(KeyError):
+            record["pm25"]
+
+    def test_layout_and_values_are_shared(self, status):
+        first = DeviceStatus(json.loads(json.dumps(status)))
+        second = DeviceStatus(json.loads(json.dumps(status)))
+        assert first._keys is second._keys
+        assert first.mode is second.mode
+
+    def test_pickle_round_trip(self, status):
+        record = pickle.loads(pickle.dumps(DeviceStatus(status)))
+        assert record == status
+        assert isinstance(record, DeviceStatus)
@@ -0,0 +1,136 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from pyairctrl.exporter import Exporter, MetricsCache, MetricsServer
+
+
+class FakeClient:
+    def __init__(self, statuses):
+        self.statuses = iter(statuses)
+        self.calls = 0
+        self.closed = False
+
+    def get_status(self):
+        self.calls += 1
+        status = next(self.statuses)
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+    def close(self):
+        self.closed = True
+
+
+def samples(body):
+    return [line for line in body.decode("utf8").splitlines() if line[0] != "#"]
+
+
+class TestMetricsCache:
+    def test_numeric_readings_are_exported(self):
+        cache = MetricsCache()
+        status = {"pm25": 4, "temp": 21.5, "mode": "A", "cl": False}
+        cache.update("h", status, None, 0.1)
+        lines = samples(cache.render())
+        assert 'airctrl_pm25{host="h"} 4' in lines
+        assert 'airctrl_temp{host="h"} 21.5' in lines
+        assert 'airctrl_up{host="h"} 1' in lines
+        assert 'airctrl_request_duration_seconds{host="h"} 0.1' in lines
+        assert not [line for line in lines if "mode" in line or "_cl" in line]
+
+    def test_errors_are_counted_and_keep_last_readings(self):
+        cache = MetricsCache()
+        cache.update("h", {"pm25": 4}, None, 0.1)
+        cache.update("h", None, "timeout", 2.0)
+        lines = samples(cache.render())
+        assert 'airctrl_up{host="h"} 0' in lines
+        assert 'airctrl_requests_total{host="h"} 2' in lines
+        assert 'airctrl_request_errors_total{host="h"} 1' in lines
+        assert 'airctrl_pm25{host="h"} 4' in lines
+
+    def test_body_is_rendered_once_per_change(self):
+        cache = MetricsCache(["h"])
+        body = cache.render()
+        assert cache.render() is body
+        cache.update("h", {"pm25": 4}, None, 0.1)
+        assert cache.render() is not body
+
+    def test_metric_types_are_declared_once(self):
+        cache = MetricsCache()
+        cache.update("a", {"pm25": 4}, None, 0.1)
+        cache.update("b", {"pm25": 5}, None, 0.1)
+        body = cache.render().decode("utf8")
+        assert body.count("# TYPE airctrl_pm25 gauge") == 1
+        assert body.count("# TYPE airctrl_requests_total counter") == 1
+
+    def test_labels_are_escaped(self):
+        cache = MetricsCache()
+        cache.update('a"b', {"pm25": 4}, None, 0.1)
+        assert 'airctrl_pm25{host="a\\"b"} 4' in samples(cache.render())
+
+
+class TestExporter:
+    @pytest.fixture
+    def exporter(self):
+        exporter = Exporter(["h"], interval=5.0)
+        yield exporter
+        exporter.stop()
+
+    def test_failed_client_is_recreated(self, exporter):
+        clients = [
+            FakeClient([ConnectionError("refused")]),
+            FakeClient([{"pm25": 7}]),
+        ]
+        exporter._create_client = lambda host: clients.pop(0)
+        exporter.poll_once()
+        assert 'airctrl_up{host="h"} 0' in samples(exporter.cache.render())
+        exporter.poll_once()
+        lines = samples(exporter.cache.render())
+        assert 'airctrl_up{host="h"} 1' in lines
+        assert 'airctrl_pm25{host="h"} 7' in lines
+        assert not clients
+
+    def test_client_is_kept_between_polls(self, exporter):
+        client = FakeClient([{"pm25": 1}, {"pm25": 2}])
+        created = []
+        exporter._create_client = lambda host: created.append(host) or client
+        exporter.poll_once()
+        exporter.poll_once()
+        assert created == ["h"]
+        assert client.calls == 2
+
+    def test_empty_status_is_an_error(self, exporter):
+        client = FakeClient([{}])
+        exporter._create_client = lambda host: client
+        exporter.poll_once()
+        lines = samples(exporter.cache.render())
+        assert 'airctrl_request_errors_total{host="h"} 1' in lines
+        assert client.closed
+
+
+class TestMetricsServer:
+    @pytest.fixture
+    def server(self):
+        cache = MetricsCache()
+        cache.update("h", {"pm25": 4}, None, 0.1)
+        server = MetricsServer(("127.0.0.1", 0), cache)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    def test_scrape_returns_cached_metrics(self, server):
+        url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read() == server.cache.render()
+
+    def test_other_paths_are_not_found(self, server):
+        url = "http://127.0.0.1:{}/".format(server.server_address[1])
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url)
+        assert e.value.code == 404
@@ -0,0 +1,133 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import os
+import json
+import time
+import socket
+import asyncio
+import pytest
+from pyairctrl.fleet import FleetPoller, read_hosts_file
+from pyairctrl.airctrl import FleetCli
+from pyairctrl.output import create_output
+from coap_test_server import CoAPTestServer
+from coap_resources import SyncResource, ControlResource, StatusResource
+
+
+class TestFleet:
+    @pytest.fixture(scope="class")
+    def test_data(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dir_path, "data.json"), "r") as json_file:
+            return json.load(json_file)
+
+    @pytest.fixture(scope="class")
+    def sync_resource(self):
+        return SyncResource()
+
+    @pytest.fixture(scope="class")
+    def status_resource(self):
+        status_resource = StatusResource()
+        status_resource.set_dataset("status")
+        # the client derives the AES key from the counter in the payload,
+        # so any counter works for every client in the fleet
+        status_resource.set_encryption_key(SyncResource.SYNC_KEY)
+        return status_resource
+
+    @pytest.fixture(scope="class", autouse=True)
+    def coap_server(self, sync_resource, status_resource):
+        server = CoAPTestServer(5683)
+        server.add_url_rule("/sys/dev/status", status_resource)
+        server.add_url_rule("/sys/dev/control", ControlResource())
+        server.add_url_rule("/sys/dev/sync", sync_resource)
+        server.start()
+        yield server
+        server.stop()
+
+    def collect(self, poller):
+        async def collect():
+            return [result async for result in poller.poll()]
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(collect())
+        finally:
+            poller.close()
+            loop.close()
+
+    def test_read_hosts_file(self, tmp_path):
+        fpath = tmp_path / "hosts.txt"
+        fpath.write_text("# living room\n192.168.0.17\n\n192.168.0.18  # bedroom\n")
+        assert read_hosts_file(str(fpath)) == ["192.168.0.17", "192.168.0.18"]
+
+    def test_poll_many_devices(self, test_data):
+        poller = FleetPoller(["127.0.0.1"] * 8, "coap", concurrency=3, deadline=5)
+        results = self.collect(poller)
+        expected = json.loads(test_data["coap"]["status"]["data"])
+        assert len(results) == 8
+        for result in results:
+            assert result.error is None
+            assert result.status == expected
+
+    def test_poll_changes(self, status_resource):
+        async def collect():
+            poller = FleetPoller(["127.0.0.1"], "coap", deadline=5)
+            results = []
+            try:
+                async for result in poller.poll_changes(interval=0):
+                    results.append(result)
+                    if len(results) == 2:
+                        break
+                    status_resource.set_dataset("status-err193")
+            finally:
+                poller.close()
+                status_resource.set_dataset("status")
+            return results
+
+        loop = asyncio.new_event_loop()
+        try:
+            first, second = loop.run_until_complete(collect())
+        finally:
+            loop.close()
+        assert "pwr" in first.status
+        assert second.status["err"] == 193
+        assert "pwr" not in second.status
+
+    def test_unreachable_device_is_reported(self):
+        poller = FleetPoller(["127.0.0.1", "127.0.0.2"], "coap", deadline=1)
+        results = {r.host: r for r in self.collect(poller)}
+        assert results["127.0.0.1"].error is None
+        assert results["127.0.0.2"].status is None
+        assert results["127.0.0.2"].error is not None
+
+    def test_deadline_holds_for_blocking_clients(self):
+        # accepts connections but never answers
+        silent = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        silent.bind(("127.0.0.1", 0))
+        silent.listen(8)
+        host = "127.0.0.1:{}".format(silent.getsockname()[1])
+        try:
+            poller = FleetPoller([host, host], "http", deadline=1)
+            start = time.monotonic()
+            results = self.collect(poller)
+            elapsed = time.monotonic() - start
+        finally:
+            silent.close()
+        assert [r.status for r in results] == [None, None]
+        assert elapsed < 1.5
+
+    def test_cli_prints_every_device(self, test_data, capfd):
+        FleetCli(["127.0.0.1", "127.0.0.1"], "coap", deadline=5).get_status()
+        result, err = capfd.readouterr()
+        device_output = "[127.0.0.1]\n" + test_data["coap"]["status-cli"]["data"]
+        assert result == device_output * 2
+
+    def test_cli_writes_ndjson_records(self, test_data, capfd):
+        output = create_output("ndjson")
+        hosts = ["127.0.0.1", "127.0.0.2"]
+        FleetCli(hosts, "coap", deadline=1, output=output).get_status()
+        result, err = capfd.readouterr()
+        records = {r["host"]: r for r in map(json.loads, result.splitlines())}
+        expected = json.loads(test_data["coap"]["status"]["data"])
+        expected["host"] = "127.0.0.1"
+        assert records["127.0.0.1"] == expected
+        assert "error" in records["127.0.0.2"]
@@ -2,9 +2,20 @@
 
 import os
 import json
+import threading
+import urllib.error
+import http.server
+import socketserver
 import pytest
-from pyairctrl.http_client import HTTPAirClient
-from pyairctrl.airctrl import HTTPAirCli
+import binascii
+import time
+from pyairctrl.http_client import HTTPAirClient, KeepAliveTransport
+from pyairctrl.keystore import KeyStore
+from pyairctrl.retry import RetryPolicy
+from pyairctrl.fleet import warm_keys
+from pyairctrl import airctrl
+from pyairctrl.airctrl import HTTPAirCli, main
+from pyairctrl.registry import DeviceRegistry
 from http_test_server import HttpTestServer
 from http_test_controller import HttpTestController
 
@@ -100,6 +111,58 @@ class TestHTTP:
     def test_get_filters_is_valid(self, air_client, test_data):
         self.assert_json_data(air_client.get_filters, "fltsts", test_data)
 
+    def keystore(self, tmp_path, key=None, validated_at=None):
+        keystore = KeyStore(str(tmp_path / "keys.db"), str(tmp_path / "keys.ini"))
+        if key is not None:
+            hex_key = binascii.hexlify(key.encode("ascii")).decode("ascii")
+            keystore.set("keys", "127.0.0.1", hex_key)
+        if validated_at is not None:
+            keystore.set("validated", "127.0.0.1", repr(validated_at))
+        return keystore
+
+    def test_optimistic_client_skips_key_check(self, tmp_path, test_data):
+        keystore = self.keystore(tmp_path, self.device_key)
+        transport = CountingTransport()
+        air_client = HTTPAirClient(
+            "127.0.0.1", transport=transport, keystore=keystore, optimistic=True
+        )
+        assert transport.requests == []
+        self.assert_json_data(air_client.get_status, "status", test_data)
+        assert transport.requests == [("GET", "/di/v1/products/1/air")]
+
+    def test_optimistic_client_replaces_stale_key(self, tmp_path, test_data):
+        keystore = self.keystore(tmp_path, "0000000000000000")
+        air_client = HTTPAirClient("127.0.0.1", keystore=keystore, optimistic=True)
+        self.assert_json_data(air_client.get_status, "status", test_data)
+        hex_key = keystore.get("keys", "127.0.0.1")
+        assert bytes.fromhex(hex_key).decode("ascii") == self.device_key
+
+    def test_transport_error_does_not_rekey(self, tmp_path, test_data):
+        keystore = self.keystore(tmp_path, self.device_key)
+        transport = FlakyTransport()
+        air_client = HTTPAirClient(
+            "127.0.0.1",
+            transport=transport,
+            keystore=keystore,
+            optimistic=True,
+            retry_policy=RetryPolicy(sleep=lambda delay: None),
+        )
+        self.assert_json_data(air_client.get_status, "status", test_data)
+        assert transport.requests == [("GET", "/di/v1/products/1/air")] * 2
+
+    def test_recently_validated_key_is_not_checked(self, tmp_path):
+        keystore = self.keystore(tmp_path, self.device_key, time.time())
+        transport = CountingTransport()
+        HTTPAirClient("127.0.0.1", transport=transport, keystore=keystore)
+        assert transport.requests == []
+
+    def test_expired_key_is_checked(self, tmp_path):
+        keystore = self.keystore(tmp_path, self.device_key, time.time() - 3600)
+        transport = CountingTransport()
+        HTTPAirClient("127.0.0.1", transport=transport, keystore=keystore)
+        assert transport.requests == [("GET", "/di/v1/products/1/air")]
+        assert float(keystore.get("validated", "127.0.0.1")) > time.time() - 60
+
     def test_get_cli_status_is_valid(self, air_cli, test_data, capfd):
         self.assert_cli_data(air_cli.get_status, "status-cli", test_data, capfd)
 
@@ -112,6 +175,32 @@ class TestHTTP:
     def test_get_cli_filters_is_valid(self, air_cli, test_data, capfd):
         self.assert_cli_data(air_cli.get_filters, "fltsts-cli", test_data, capfd)
 
+    def test_structured_output_keeps_diagnostics_off_stdout(
+        self, test_data, monkeypatch, capsys
+    ):
+        argv = ["airctrl", "--ipaddr", "127.0.0.1", "--no-daemon", "--debug"]
+        monkeypatch.setattr("sys.argv", argv + ["--format", "json"])
+        main()
+        out, err = capsys.readouterr()
+        status = json.loads(test_data["http"]["status"]["data"])
+        assert json.loads(out)[0]["pm25"] == status["pm25"]
+        assert err
+
+    def test_moved_device_is_searched_again(self, test_data, monkeypatch, capsys):
+        registry = DeviceRegistry()
+        # nothing listens on the remembered address any more
+        registry.update({"ip": "127.0.0.9"})
+        monkeypatch.setattr(registry, "refresh", lambda: [{"ip": "127.0.0.1"}])
+        monkeypatch.setattr(airctrl, "_device_registry", lambda ttl: registry)
+        argv = ["airctrl", "--no-daemon", "--format", "json"]
+        monkeypatch.setattr("sys.argv", argv)
+        main()
+        out, err = capsys.readouterr()
+        status = json.loads(test_data["http"]["status"]["data"])
+        assert json.loads(out)[0]["pm25"] == status["pm25"]
+        assert "127.0.0.9 did not answer" in err
+        assert registry.devices() == []
+
     def assert_json_data(self, air_func, dataset, test_data):
         result = air_func()
         data = test_data["http"][dataset]["data"]
@@ -122,3 +211,125 @@ class TestHTTP:
         air_func()
         result, err = capfd.readouterr()
         assert result == test_data["http"][dataset]["data"]
+
+
+class CountingTransport(KeepAliveTransport):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def request(self, host, method, path, body=None, decode=None):
+        self.requests.append((method, path))
+        return super().request(host, method, path, body, decode)
+
+
+class FlakyTransport(CountingTransport):
+    def request(self, host, method, path, body=None, decode=None):
+        if not self.requests:
+            self.requests.append((method, path))
+            raise ConnectionResetError("reset by peer")
+        return super().request(host, method, path, body, decode)
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.peers.append(self.client_address)
+        code = 404 if self.path == "/missing" else 200
+        body = b"x" * 10000 if self.path == "/large" else b"ok"
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == "/close":
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # http.server.ThreadingHTTPServer needs Python 3.7
+    daemon_threads = True
+
+
+class TestKeepAliveTransport:
+    @pytest.fixture
+    def server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        server.peers = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    def host(self, server):
+        return "127.0.0.1:{}".format(server.server_address[1])
+
+    def test_connection_is_reused(self, server):
+        transport = KeepAliveTransport()
+        for _ in range(3):
+            assert transport.request(self.host(server), "GET", "/air") == b"ok"
+        transport.close()
+        assert len(set(server.peers)) == 1
+
+    def test_reconnects_after_server_closed_connection(self, server):
+        transport = KeepAliveTransport()
+        assert transport.request(self.host(server), "GET", "/close") == b"ok"
+        assert transport.request(self.host(server), "GET", "/air") == b"ok"
+        transport.close()
+        assert len(set(server.peers)) == 2
+
+    def test_idle_connection_is_reopened(self, server):
+        transport = KeepAliveTransport(idle_timeout=0)
+        transport.request(self.host(server), "GET", "/air")
+        transport.request(self.host(server), "GET", "/air")
+        transport.close()
+        assert len(set(server.peers)) == 2
+
+    def test_decode_reads_into_connection_buffer(self, server):
+        transport = KeepAliveTransport()
+        assert transport.request(self.host(server), "GET", "/air", decode=bytes) == b"ok"
+        large = transport.request(self.host(server), "GET", "/large", decode=bytes)
+        transport.close()
+        assert large == b"x" * 10000
+
+    def test_error_status_raises_http_error(self, server):
+        transport = KeepAliveTransport()
+        with pytest.raises(urllib.error.HTTPError) as e:
+            transport.request(self.host(server), "GET", "/missing")
+        transport.close()
+        assert e.value.code == 404
+
+
+class TestWarmKeys:
+    device_key = "1234567890123456"
+
+    @pytest.fixture(scope="class", autouse=True)
+    def create_http_server(self):
+        controller = HttpTestController(self.device_key)
+        httpServer = HttpTestServer(5000)
+        httpServer.add_url_rule(
+            "/di/v1/products/0/security", view_func=controller.security, methods=["PUT"]
+        )
+        httpServer.start()
+        yield httpServer
+        httpServer.stop()
+
+    def test_keys_are_saved_in_one_batch(self, tmp_path):
+        keystore = KeyStore(str(tmp_path / "keys.db"), str(tmp_path / "keys.ini"))
+        results = warm_keys(
+            ["127.0.0.1", "127.0.0.1:1"], processes=2, deadline=2, keystore=keystore
+        )
+
+        results = {r.host: r for r in results}
+        assert results["127.0.0.1"].session_key.decode("ascii") == self.device_key
+        assert results["127.0.0.1"].elapsed > 0
+        assert results["127.0.0.1:1"].error is not None
+        hex_key = keystore.get("keys", "127.0.0.1")
+        assert bytes.fromhex(hex_key).decode("ascii") == self.device_key
+        assert keystore.get("validated", "127.0.0.1") is not None
+        assert keystore.get("keys", "127.0.0.1:1") is None
@@ -0,0 +1,40 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import json
+import pytest
+from collections import OrderedDict
+from pyairctrl.http_codec import HTTPCodec
+from http_test_controller import HttpTestController
+
+
+class TestHTTPCodec:
+    session_key = b"0123456789abcdef"
+    values = OrderedDict([("pwr", "1"), ("om", "s"), ("name", "x" * 100)])
+
+    @pytest.fixture
+    def codec(self):
+        return HTTPCodec(self.session_key)
+
+    @pytest.fixture
+    def controller(self):
+        return HttpTestController("1234567890123456")
+
+    def test_decodes_device_body(self, codec, controller):
+        body = controller._padding_encrypt(self.values, self.session_key)
+        status = codec.decode(body)
+        assert status == self.values
+        assert list(status) == list(self.values)
+
+    def test_decodes_memoryview(self, codec, controller):
+        body = controller._padding_encrypt(self.values, self.session_key)
+        buffer = bytearray(body + b"garbage")
+        assert codec.decode(memoryview(buffer)[: len(body)]) == self.values
+
+    def test_device_decrypts_encoded_body(self, codec, controller):
+        body = codec.encode(self.values)
+        assert json.loads(controller._decrypt(body, self.session_key)) == self.values
+
+    def test_wrong_key_raises_value_error(self, controller):
+        body = controller._padding_encrypt(self.values, self.session_key)
+        with pytest.raises(ValueError):
+            HTTPCodec(b"fedcba9876543210").decode(body)
@@ -0,0 +1,61 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import json
+import pytest
+from collections import OrderedDict
+from pyairctrl import json_codec
+
+CODECS = [
+    name
+    for name in json_codec.CODECS
+    if name != "orjson" or json_codec.orjson is not None
+]
+
+
+class TestJSONCodec:
+    payload = '{"state":{"reported":{"pwr":"1","om":"s","mode":"A","pm25":4}}}'
+
+    @pytest.fixture(params=CODECS)
+    def codec(self, request):
+        return json_codec.create_json_codec(request.param)
+
+    @pytest.fixture
+    def restore_default(self):
+        codec = json_codec.get_json_codec()
+        yield
+        json_codec.set_json_codec(codec)
+
+    def test_loads_str_bytes_and_memoryview(self, codec):
+        expected = json.loads(self.payload)
+        assert codec.loads(self.payload) == expected
+        assert codec.loads(self.payload.encode("ascii")) == expected
+        assert codec.loads(memoryview(self.payload.encode("ascii"))) == expected
+
+    def test_loads_keeps_key_order(self, codec):
+        reported = codec.loads(self.payload)["state"]["reported"]
+        assert list(reported) == ["pwr", "om", "mode", "pm25"]
+
+    def test_dumps_round_trip(self, codec):
+        values = OrderedDict([("name", "Living Room"), ("pm25", 4), ("cl", False)])
+        assert json.loads(codec.dumps(values)) == values
+
+    def test_dumps_is_ascii(self, codec):
+        assert codec.dumps({"name": "Küche"}) == json.dumps({"name": "Küche"})
+
+    def test_default_decodes_plain_dicts(self, monkeypatch):
+        monkeypatch.setattr(json_codec, "DICTS_ARE_ORDERED", True)
+        status = json_codec.create_json_codec().loads(self.payload)
+        assert type(status) is dict
+
+    def test_default_keeps_order_before_python_3_7(self, monkeypatch):
+        monkeypatch.setattr(json_codec, "orjson", None)
+        monkeypatch.setattr(json_codec, "DICTS_ARE_ORDERED", False)
+        assert json_codec.create_json_codec().name == "ordered"
+
+    def test_set_json_codec_by_name(self, restore_default):
+        json_codec.set_json_codec("ordered")
+        assert type(json_codec.loads(self.payload)) is OrderedDict
+
+    def test_unknown_codec_raises(self):
+        with pytest.raises(ValueError):
+            json_codec.create_json_codec("yaml")
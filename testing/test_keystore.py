@@ -0,0 +1,61 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import threading
+from pyairctrl.keystore import KeyStore
+
+
+class TestKeyStore:
+    def keystore(self, tmp_path):
+        return KeyStore(
+            str(tmp_path / "pyairctrl.db"), str(tmp_path / "pyairctrl.ini")
+        )
+
+    def test_get_returns_saved_value(self, tmp_path):
+        keystore = self.keystore(tmp_path)
+        assert keystore.get("keys", "192.168.0.17") is None
+        keystore.set("keys", "192.168.0.17", "00ff")
+        keystore.set("keys", "192.168.0.17", "0102")
+        assert keystore.get("keys", "192.168.0.17") == "0102"
+
+    def test_delete(self, tmp_path):
+        keystore = self.keystore(tmp_path)
+        keystore.set("keys", "192.168.0.17", "00ff")
+        keystore.delete("keys", "192.168.0.17")
+        assert keystore.get("keys", "192.168.0.17", "missing") == "missing"
+
+    def test_items(self, tmp_path):
+        keystore = self.keystore(tmp_path)
+        keystore.set_many("keys", {"192.168.0.17": "00ff", "192.168.0.18": "0102"})
+        keystore.set("cloud", "client_id", "000000fff10d40a1")
+        assert keystore.items("keys") == {
+            "192.168.0.17": "00ff",
+            "192.168.0.18": "0102",
+        }
+        assert keystore.items("devices") == {}
+
+    def test_legacy_file_is_migrated(self, tmp_path):
+        (tmp_path / "pyairctrl.ini").write_text(
+            "[keys]\n192.168.0.17 = 00ff\n\n[cloud]\nclient_id = 000000fff10d40a1\n"
+        )
+        keystore = self.keystore(tmp_path)
+        assert keystore.get("keys", "192.168.0.17") == "00ff"
+        assert keystore.get("cloud", "client_id") == "000000fff10d40a1"
+
+    def test_legacy_file_is_migrated_only_once(self, tmp_path):
+        (tmp_path / "pyairctrl.ini").write_text("[keys]\n192.168.0.17 = 00ff\n")
+        self.keystore(tmp_path).set("keys", "192.168.0.17", "0102")
+        assert self.keystore(tmp_path).get("keys", "192.168.0.17") == "0102"
+
+    def test_parallel_writers_do_not_lose_updates(self, tmp_path):
+        def save(index):
+            self.keystore(tmp_path).set("keys", "10.0.0.{}".format(index), "00ff")
+
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        keystore = self.keystore(tmp_path)
+        for index in range(20):
+            assert keystore.get("keys", "10.0.0.{}".format(index)) == "00ff"
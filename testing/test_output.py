@@ -0,0 +1,67 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import io
+import csv
+import json
+import pytest
+from pyairctrl.output import create_output
+
+
+class TestOutput:
+    status = {"pwr": "1", "fltsts0": 287, "newkey": "x"}
+
+    def write(self, output_format, show_host=False):
+        stream = io.StringIO()
+        output = create_output(output_format, stream, show_host)
+        output.write_status("10.0.0.1", self.status)
+        output.write_error("10.0.0.2", "timed out")
+        output.write_message("10.0.0.3", "No info found")
+        output.close()
+        return stream.getvalue()
+
+    def test_text(self):
+        assert self.write("text", show_host=True) == (
+            "[10.0.0.1]\n"
+            "[pwr]                         Power: ON\n"
+            "[fltsts0]                     Pre-filter and Wick: clean in 287 hours\n"
+            "[newkey]                      newkey: x\n"
+            "[10.0.0.2]\n"
+            "Error: timed out\n"
+            "[10.0.0.3]\n"
+            "No info found\n"
+        )
+
+    def test_ndjson(self):
+        lines = self.write("ndjson").splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"host": "10.0.0.1", "pwr": "1", "fltsts0": 287, "newkey": "x"},
+            {"host": "10.0.0.2", "error": "timed out"},
+            {"host": "10.0.0.3", "error": "No info found"},
+        ]
+
+    def test_json(self):
+        records = json.loads(self.write("json"))
+        assert [r["host"] for r in records] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+    def test_json_without_records(self):
+        stream = io.StringIO()
+        create_output("json", stream).close()
+        assert json.loads(stream.getvalue()) == []
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.write("csv"))))
+        assert rows[0]["host"] == "10.0.0.1"
+        assert rows[0]["pwr"] == "1"
+        assert rows[0]["fltsts0"] == "287"
+        assert rows[0]["pm25"] == ""
+        assert json.loads(rows[0]["other"]) == {"newkey": "x"}
+        assert rows[1]["error"] == "timed out"
+
+    def test_subset_only_writes_subset_keys(self):
+        stream = io.StringIO()
+        create_output("ndjson", stream).write_status("h", self.status, "filter")
+        assert json.loads(stream.getvalue()) == {"host": "h", "fltsts0": 287}
+
+    def test_unknown_format_raises(self):
+        with pytest.raises(ValueError):
+            create_output("xml")
@@ -60,6 +60,33 @@ class TestPlainCoap:
         result = air_client.set_values(values)
         assert result
 
+    def test_set_values_sends_hello_once(self, control_resource, monkeypatch):
+        air_client = PlainCoAPAirClient("127.0.0.1")
+        hellos = []
+        monkeypatch.setattr(air_client, "_send_hello_sequence", hellos.append)
+
+        control_resource.append_data('{"om": "2"}')
+        assert air_client.set_values({"mode": "A", "om": "2"})
+        assert len(hellos) == 1
+
+    def test_session_reuses_client(self, monkeypatch):
+        hellos = []
+        with PlainCoAPAirClient("127.0.0.1") as air_client:
+            monkeypatch.setattr(air_client, "_send_hello_sequence", hellos.append)
+            assert air_client.set_values({"mode": "A"})
+            assert air_client.set_values({"mode": "A"})
+            session_client = air_client._session_client
+        assert len(hellos) == 1
+        assert set(hellos) == {session_client}
+
+    def test_session_says_hello_again_after_timeout(self, monkeypatch):
+        hellos = []
+        with PlainCoAPAirClient("127.0.0.1", session_timeout=0) as air_client:
+            monkeypatch.setattr(air_client, "_send_hello_sequence", hellos.append)
+            air_client.set_values({"mode": "A"})
+            air_client.set_values({"mode": "A"})
+        assert len(hellos) == 2
+
     def test_get_status_is_valid(self, air_client, test_data, monkeypatch):
         self.assert_json_data(
             air_client.get_status, "status", test_data, monkeypatch, air_client,
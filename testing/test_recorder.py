@@ -0,0 +1,115 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import io
+import math
+import os
+import pytest
+from pyairctrl.recorder import Recorder, Segment
+from pyairctrl.output import RecordingOutput, create_output
+
+DAY = 24 * 60 * 60
+# 2023-11-14 22:13:20 UTC
+T0 = 1700000000.0
+
+
+class TestRecorder:
+    @pytest.fixture
+    def recorder(self, tmp_path):
+        with Recorder(str(tmp_path)) as recorder:
+            yield recorder
+
+    def test_round_trip(self, recorder):
+        recorder.append("10.0.0.1", {"pm25": 4, "rh": "40", "err": 193}, T0)
+        recorder.append("10.0.0.1", {"pm25": 5, "mode": "A"}, T0 + 60)
+        recorder.close()
+        series = recorder.query("10.0.0.1")
+        assert len(series) == 2
+        assert list(series.timestamps) == [T0, T0 + 60]
+        assert list(series["pm25"]) == [4.0, 5.0]
+        assert series["rh"][0] == 40.0
+        assert series["err"][0] == 193.0
+        assert math.isnan(series["err"][1])
+
+    def test_range_query_spans_segments(self, recorder):
+        for i in range(6):
+            recorder.append("10.0.0.1", {"pm25": i}, T0 + i * DAY / 2)
+        recorder.close()
+        assert len(recorder.segments("10.0.0.1")) == 4
+        series = recorder.query("10.0.0.1", T0 + DAY / 2, T0 + 2 * DAY)
+        assert list(series["pm25"]) == [1.0, 2.0, 3.0]
+
+    def test_devices_are_separate(self, recorder):
+        recorder.append("10.0.0.1", {"pm25": 1}, T0)
+        recorder.append("10.0.0.2", {"pm25": 2}, T0)
+        recorder.close()
+        assert recorder.hosts() == ["10.0.0.1", "10.0.0.2"]
+        assert list(recorder.query("10.0.0.2")["pm25"]) == [2.0]
+        assert len(recorder.query("10.0.0.3")) == 0
+
+    def test_partly_written_record_is_ignored(self, recorder):
+        recorder.append("10.0.0.1", {"pm25": 1}, T0)
+        recorder.close()
+        path = recorder.segments("10.0.0.1")[0]
+        with open(path, "ab") as f:
+            f.write(b"\1\2\3")
+        segment = Segment(path)
+        assert segment.rows == 1
+        segment.close()
+
+    def test_reopen_cuts_off_partly_written_record(self, tmp_path):
+        with Recorder(str(tmp_path)) as recorder:
+            recorder.append("10.0.0.1", {"pm25": 1}, T0)
+        path = recorder.segments("10.0.0.1")[0]
+        with open(path, "ab") as f:
+            f.write(b"\1\2\3")
+        with Recorder(str(tmp_path)) as recorder:
+            recorder.append("10.0.0.1", {"pm25": 2}, T0 + 60)
+        series = recorder.query("10.0.0.1")
+        assert list(series.timestamps) == [T0, T0 + 60]
+        assert list(series["pm25"]) == [1.0, 2.0]
+
+    def test_two_writers_keep_every_record(self, tmp_path):
+        with Recorder(str(tmp_path)) as first, Recorder(str(tmp_path)) as second:
+            for i in range(10):
+                first.append("10.0.0.1", {"pm25": i}, T0 + i)
+                second.append("10.0.0.1", {"pm25": 100 + i}, T0 + i + 0.5)
+        series = first.query("10.0.0.1")
+        assert len(first.segments("10.0.0.1")) == 1
+        assert len(series) == 20
+        assert sorted(series["pm25"]) == [float(i) for i in range(10)] + [
+            float(100 + i) for i in range(10)
+        ]
+
+    def test_other_fields_start_new_segment(self, tmp_path):
+        with Recorder(str(tmp_path), ("pm25", "rh")) as recorder:
+            recorder.append("10.0.0.1", {"pm25": 1, "rh": 40}, T0)
+        with Recorder(str(tmp_path), ("pm25",)) as recorder:
+            recorder.append("10.0.0.1", {"pm25": 2}, T0 + 60)
+            recorder.append("10.0.0.1", {"pm25": 3}, T0 + 120)
+        paths = recorder.segments("10.0.0.1")
+        assert [os.path.basename(p) for p in paths] == [
+            "20231114.seg",
+            "20231114.1.seg",
+        ]
+        assert list(recorder.query("10.0.0.1")["pm25"]) == [2.0, 3.0]
+        old = Recorder(str(tmp_path), ("pm25", "rh"))
+        assert list(old.query("10.0.0.1")["rh"]) == [40.0]
+
+    def test_numpy_view(self, recorder):
+        numpy = pytest.importorskip("numpy")
+        recorder.append("10.0.0.1", {"pm25": 1}, T0)
+        recorder.close()
+        series = recorder.query("10.0.0.1")
+        assert isinstance(series.data, numpy.ndarray)
+        assert series.data.shape == (1, len(recorder.fields) + 1)
+
+    def test_recording_output_records_statuses_only(self, recorder):
+        stream = io.StringIO()
+        output = RecordingOutput(create_output("ndjson", stream), recorder)
+        output.write_status("10.0.0.1", {"pm25": 3})
+        output.write_status("10.0.0.1", {"fltsts0": 3}, "filter", False)
+        output.write_error("10.0.0.2", "timed out")
+        output.close()
+        assert len(stream.getvalue().splitlines()) == 3
+        assert list(recorder.query("10.0.0.1")["pm25"]) == [3.0]
+        assert recorder.hosts() == ["10.0.0.1"]
@@ -0,0 +1,92 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import pytest
+from pyairctrl import registry as registry_module
+from pyairctrl.keystore import KeyStore
+from pyairctrl.registry import DeviceRegistry
+
+ANSWERS = {
+    "192.168.0.17": "http://192.168.0.17/description.xml",
+    "192.168.0.18": "http://192.168.0.18/description.xml",
+}
+
+
+class FakeNetwork:
+    def __init__(self):
+        self.searches = 0
+        self.fetched = []
+
+    def discover(self, timeout=1, repeats=3, fetch=None, **kwargs):
+        self.searches += 1
+        for ip, url in ANSWERS.items():
+            device = {"ip": ip}
+            device.update(fetch(url, 2.0))
+            yield device
+
+    def fetch(self, url, timeout):
+        self.fetched.append(url)
+        return {"modelName": "AirPurifier", "modelNumber": "AC2729"}
+
+
+@pytest.fixture
+def network(monkeypatch):
+    network = FakeNetwork()
+    monkeypatch.setattr(registry_module, "discover", network.discover)
+    return network
+
+
+@pytest.fixture
+def keystore(tmp_path):
+    return KeyStore(str(tmp_path / "pyairctrl.db"), str(tmp_path / "pyairctrl.ini"))
+
+
+class TestDeviceRegistry:
+    def test_lookup_discovers_on_miss(self, network):
+        registry = DeviceRegistry()
+        devices = registry.lookup(fetch=network.fetch)
+        assert [d["ip"] for d in devices] == list(ANSWERS)
+        assert network.searches == 1
+
+    def test_fresh_devices_skip_discovery(self, network, keystore):
+        DeviceRegistry(keystore).lookup(fetch=network.fetch)
+        devices = DeviceRegistry(keystore).lookup(fetch=network.fetch)
+        assert network.searches == 1
+        assert devices[0] == {
+            "ip": "192.168.0.17",
+            "modelName": "AirPurifier",
+            "modelNumber": "AC2729",
+        }
+
+    def test_expired_devices_are_discovered_again(self, network, keystore):
+        DeviceRegistry(keystore).lookup(fetch=network.fetch)
+        registry = DeviceRegistry(keystore, ttl=0.0)
+        assert registry.devices() == []
+        registry.lookup(fetch=network.fetch)
+        assert network.searches == 2
+
+    def test_descriptions_are_cached_by_location(self, network, keystore):
+        DeviceRegistry(keystore).lookup(fetch=network.fetch)
+        DeviceRegistry(keystore).lookup(refresh=True, fetch=network.fetch)
+        assert network.searches == 2
+        assert sorted(network.fetched) == sorted(ANSWERS.values())
+
+    def test_expired_descriptions_are_fetched_again(self, network, keystore):
+        registry = DeviceRegistry(keystore, description_ttl=0.0)
+        registry.lookup(fetch=network.fetch)
+        registry.lookup(refresh=True, fetch=network.fetch)
+        assert len(network.fetched) == 4
+
+    def test_update_and_remove(self, keystore):
+        registry = DeviceRegistry(keystore)
+        registry.update({"ip": "10.0.0.1", "friendlyName": "Bedroom"})
+        assert DeviceRegistry(keystore).devices() == [
+            {"ip": "10.0.0.1", "friendlyName": "Bedroom"}
+        ]
+        registry.remove("10.0.0.1")
+        assert DeviceRegistry(keystore).devices() == []
+
+    def test_last_seen_is_kept(self):
+        registry = DeviceRegistry(ttl=10.0)
+        registry.update({"ip": "10.0.0.1"}, now=100.0)
+        assert registry.devices(now=105.0) == [{"ip": "10.0.0.1"}]
+        assert registry.devices(now=111.0) == []
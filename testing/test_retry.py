@@ -0,0 +1,111 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import email.message
+import json
+import socket
+import urllib.error
+import pytest
+from pyairctrl.retry import BUSY, KEY, TRANSPORT, RetryPolicy
+
+
+def http_error(code, retry_after=None):
+    headers = email.message.Message()
+    if retry_after is not None:
+        headers["Retry-After"] = retry_after
+    return urllib.error.HTTPError("http://h/", code, "error", headers, None)
+
+
+class Requests:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.rekeys = 0
+        self.sleeps = []
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def rekey(self):
+        self.rekeys += 1
+
+    def policy(self, **kwargs):
+        return RetryPolicy(sleep=self.sleeps.append, **kwargs)
+
+
+class TestClassify:
+    @pytest.mark.parametrize(
+        "error, kind",
+        [
+            (ValueError("Padding is incorrect."), KEY),
+            (UnicodeDecodeError("ascii", b"\xff", 0, 1, "bad"), KEY),
+            (json.JSONDecodeError("bad", "", 0), KEY),
+            (http_error(403), KEY),
+            (socket.timeout("timed out"), TRANSPORT),
+            (ConnectionResetError(), TRANSPORT),
+            (urllib.error.URLError("refused"), TRANSPORT),
+            (http_error(503), BUSY),
+            (http_error(429), BUSY),
+            (http_error(404), None),
+            (TypeError(), None),
+        ],
+    )
+    def test_classify(self, error, kind):
+        assert RetryPolicy().classify(error) == kind
+
+
+class TestCall:
+    def test_decrypt_failure_rekeys_once(self):
+        requests = Requests(ValueError("Padding is incorrect."), "ok")
+        assert requests.policy().call(requests, requests.rekey) == "ok"
+        assert requests.rekeys == 1
+        assert requests.sleeps == []
+
+    def test_second_decrypt_failure_is_raised(self):
+        requests = Requests(ValueError("bad"), ValueError("bad"), "ok")
+        with pytest.raises(ValueError):
+            requests.policy().call(requests, requests.rekey)
+        assert requests.rekeys == 1
+
+    def test_transport_error_backs_off_without_rekey(self):
+        requests = Requests(ConnectionResetError(), socket.timeout(), "ok")
+        policy = requests.policy(backoff=0.1, jitter=0.0)
+        assert policy.call(requests, requests.rekey) == "ok"
+        assert requests.rekeys == 0
+        assert requests.sleeps == [0.1, 0.2]
+
+    def test_attempts_are_limited(self):
+        requests = Requests(ConnectionResetError(), ConnectionResetError(), "ok")
+        with pytest.raises(ConnectionResetError):
+            requests.policy(attempts=2).call(requests, requests.rekey)
+        assert requests.calls == 2
+
+    def test_busy_device_honours_retry_after(self):
+        requests = Requests(http_error(503, "3"), "ok")
+        policy = requests.policy(jitter=0.0)
+        assert policy.call(requests, requests.rekey) == "ok"
+        assert requests.sleeps == [3.0]
+        assert requests.rekeys == 0
+
+    def test_no_retry_past_the_budget(self):
+        requests = Requests(http_error(503, "3"), "ok")
+        with pytest.raises(urllib.error.HTTPError):
+            requests.policy(budget=1.0).call(requests, requests.rekey)
+        assert requests.calls == 1
+        assert requests.sleeps == []
+
+    def test_other_errors_are_raised_at_once(self):
+        requests = Requests(http_error(404), "ok")
+        with pytest.raises(urllib.error.HTTPError):
+            requests.policy().call(requests, requests.rekey)
+        assert requests.calls == 1
+
+    def test_jitter_shortens_delay(self):
+        policy = RetryPolicy(backoff=1.0, max_backoff=4.0, jitter=0.5)
+        for attempt in range(5):
+            delay = policy.delay(TRANSPORT, attempt)
+            expected = min(2 ** attempt, 4.0)
+            assert expected * 0.5 <= delay <= expected
@@ -0,0 +1,58 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import time
+from pyairctrl.snapshot_cache import SnapshotCache
+
+
+class Fetcher:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+class TestSnapshotCache:
+    def test_disabled_by_default(self):
+        cache = SnapshotCache()
+        fetch = Fetcher({"pwr": "1"})
+        cache.get(fetch)
+        cache.get(fetch)
+        assert fetch.calls == 2
+
+    def test_reuses_snapshot_within_ttl(self):
+        cache = SnapshotCache(ttl=60)
+        fetch = Fetcher({"pwr": "1"})
+        assert cache.get(fetch) is cache.get(fetch)
+        assert fetch.calls == 1
+
+    def test_fetches_again_after_ttl(self):
+        cache = SnapshotCache(ttl=0.01)
+        fetch = Fetcher({"pwr": "1"})
+        cache.get(fetch)
+        time.sleep(0.02)
+        cache.get(fetch)
+        assert fetch.calls == 2
+
+    def test_empty_document_is_not_cached(self):
+        cache = SnapshotCache(ttl=60)
+        fetch = Fetcher({})
+        cache.get(fetch)
+        cache.get(fetch)
+        assert fetch.calls == 2
+
+    def test_invalidation_after_set_is_opt_in(self):
+        fetch = Fetcher({"pwr": "1"})
+        cache = SnapshotCache(ttl=60)
+        cache.get(fetch)
+        cache.values_set()
+        cache.get(fetch)
+        assert fetch.calls == 1
+
+        cache = SnapshotCache(ttl=60, invalidate_on_set=True)
+        cache.get(fetch)
+        cache.values_set()
+        cache.get(fetch)
+        assert fetch.calls == 3
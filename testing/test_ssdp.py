@@ -0,0 +1,219 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+import http.server
+import socket
+import threading
+import time
+import pytest
+from pyairctrl.registry import DeviceRegistry
+from pyairctrl.ssdp import (
+    NotifyListener,
+    discover,
+    fetch_description,
+    parse_description,
+)
+
+DESCRIPTION = b"""<?xml version="1.0"?>
+<root xmlns="urn:schemas-upnp-org:device-1-0">
+  <device>
+    <modelName>AirPurifier</modelName>
+    <modelNumber>AC2729</modelNumber>
+    <friendlyName>Living room</friendlyName>
+  </device>
+</root>"""
+
+
+class Responder:
+    """Answers an M-SEARCH from 127.0.0.2, 127.0.0.3, ..."""
+
+    def __init__(self, count):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.address = self.socket.getsockname()
+        self.devices = []
+        for i in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.bind(("127.0.0.{}".format(i + 2), 0))
+            self.devices.append(s)
+        self.searches = 0
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                data, address = self.socket.recvfrom(1024)
+            except OSError:
+                return
+            self.searches += 1
+            for s in self.devices:
+                ip = s.getsockname()[0]
+                reply = "HTTP/1.1 200 OK\r\nLOCATION: http://{}/description.xml\r\n\r\n"
+                s.sendto(reply.format(ip).encode("ascii"), address)
+
+    def close(self):
+        self.socket.close()
+        for s in self.devices:
+            s.close()
+
+
+@pytest.fixture
+def responder():
+    responder = Responder(5)
+    yield responder
+    responder.close()
+
+
+class TestDiscover:
+    def test_devices_are_described(self, responder):
+        def fetch(url, timeout):
+            return {"modelName": url.split("/")[2]}
+
+        devices = list(discover(0.2, target=responder.address, fetch=fetch))
+        assert sorted(d["ip"] for d in devices) == [
+            "127.0.0.{}".format(i) for i in range(2, 7)
+        ]
+        assert all(d["ip"] == d["modelName"] for d in devices)
+        assert responder.searches == 1
+
+    def test_fetches_run_concurrently(self, responder):
+        def fetch(url, timeout):
+            time.sleep(0.3)
+            return {}
+
+        start = time.monotonic()
+        devices = list(discover(0.2, target=responder.address, fetch=fetch))
+        assert len(devices) == 5
+        assert time.monotonic() - start < 1.0
+
+    def test_devices_are_yielded_as_described(self, responder):
+        def fetch(url, timeout):
+            if url.startswith("http://127.0.0.2/"):
+                time.sleep(1.0)
+            return {}
+
+        start = time.monotonic()
+        devices = discover(0.2, target=responder.address, fetch=fetch)
+        first = next(devices)
+        assert time.monotonic() - start < 0.5
+        assert first["ip"] != "127.0.0.2"
+        assert len(list(devices)) == 4
+
+    def test_failed_fetch_yields_ip(self, responder):
+        def fetch(url, timeout):
+            raise OSError("timed out")
+
+        devices = list(discover(0.2, target=responder.address, fetch=fetch))
+        assert {"ip": "127.0.0.2"} in devices
+
+    def test_search_is_repeated_without_answers(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind(("127.0.0.1", 0))
+        with s:
+            devices = list(discover(0.05, 3, target=s.getsockname()))
+            assert devices == []
+            assert len([s.recvfrom(1024) for _ in range(3)]) == 3
+
+
+class DescriptionHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(DESCRIPTION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDescription:
+    def test_parse_description(self):
+        assert parse_description(DESCRIPTION) == {
+            "modelName": "AirPurifier",
+            "modelNumber": "AC2729",
+            "friendlyName": "Living room",
+        }
+
+    def test_missing_fields_are_none(self):
+        document = b'<root xmlns="urn:schemas-upnp-org:device-1-0"><device/></root>'
+        assert parse_description(document)["modelName"] is None
+
+    def test_fetch_timeout(self):
+        server = http.server.HTTPServer(("127.0.0.1", 0), DescriptionHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{}".format(server.server_address[1])
+            assert fetch_description(url + "/")["modelNumber"] == "AC2729"
+            with pytest.raises(OSError):
+                fetch_description(url + "/slow", timeout=0.1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+def notify(kind, usn="uuid:1", nt="urn:philips-com:device:DiProduct:1", ip="h"):
+    lines = [
+        "NOTIFY * HTTP/1.1",
+        "HOST: 239.255.255.250:1900",
+        "NT: " + nt,
+        "NTS: ssdp:" + kind,
+        "USN: " + usn,
+        "LOCATION: http://{}/description.xml".format(ip),
+        "",
+        "",
+    ]
+    return "\r\n".join(lines).encode("ascii")
+
+
+class TestNotifyListener:
+    @pytest.fixture
+    def listener(self):
+        def fetch(url, timeout):
+            return {"friendlyName": url.split("/")[2]}
+
+        listener = NotifyListener(DeviceRegistry(), fetch=fetch, port=0)
+        yield listener
+        listener.stop()
+
+    def test_alive_adds_device(self, listener):
+        listener.handle(notify("alive", ip="10.0.0.1"), "10.0.0.1").result()
+        assert listener.registry.devices() == [
+            {"ip": "10.0.0.1", "friendlyName": "10.0.0.1"}
+        ]
+
+    def test_byebye_removes_device(self, listener):
+        listener.handle(notify("alive"), "10.0.0.1").result()
+        listener.handle(notify("byebye"), "10.0.0.1")
+        assert listener.registry.devices() == []
+
+    def test_ip_change_replaces_device(self, listener):
+        listener.handle(notify("alive", ip="10.0.0.1"), "10.0.0.1").result()
+        listener.handle(notify("alive", ip="10.0.0.2"), "10.0.0.2").result()
+        assert [d["ip"] for d in listener.registry.devices()] == ["10.0.0.2"]
+
+    def test_other_devices_are_ignored(self, listener):
+        assert listener.handle(notify("alive", nt="upnp:rootdevice"), "h") is None
+        search = b"M-SEARCH * HTTP/1.1\r\nST: ssdp:all\r\n\r\n"
+        assert listener.handle(search, "h") is None
+        assert listener.registry.devices() == []
+
+    def test_descriptions_are_fetched_once(self, listener):
+        fetched = []
+        listener.fetch = lambda url, timeout: fetched.append(url) or {}
+        for _ in range(3):
+            listener.handle(notify("alive"), "10.0.0.1").result()
+        assert len(fetched) == 1
+
+    def test_listens_on_socket(self, listener):
+        listener.start()
+        address = ("127.0.0.1", listener.address[1])
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(notify("alive", ip="127.0.0.1"), address)
+        deadline = time.monotonic() + 2.0
+        while not listener.registry.devices() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert listener.registry.devices()[0]["ip"] == "127.0.0.1"
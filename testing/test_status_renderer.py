@@ -0,0 +1,39 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+from pyairctrl.status_renderer import RenderPlan, render_plan
+
+
+class TestStatusRenderer:
+    status = {"pwr": "1", "fltsts0": 287, "dt": 0, "newkey": "x", "mode": "A"}
+
+    def test_renders_known_and_unknown_keys(self):
+        assert RenderPlan(None, True).render(self.status) == (
+            "[pwr]                         Power: ON\n"
+            "[fltsts0]                     Pre-filter and Wick: clean in 287 hours\n"
+            "[newkey]                      newkey: x\n"
+            "[mode]                        Mode: allergen\n"
+        )
+
+    def test_subset_skips_other_keys(self):
+        assert RenderPlan("filter", False).render(self.status) == (
+            "Pre-filter and Wick: clean in 287 hours\n"
+        )
+
+    def test_tabs_in_values_are_expanded(self):
+        assert RenderPlan(None, True).render({"name": "a\tb"}) == (
+            "[name]\tName: a\tb\n".expandtabs(30)
+        )
+
+    def test_braces_in_unknown_keys(self):
+        assert RenderPlan(None, False).render({"{x}": 1}) == "{x}: 1\n"
+
+    def test_empty_status_renders_nothing(self):
+        assert RenderPlan(None, True).render({}) == ""
+
+    def test_render_many(self):
+        plan = RenderPlan(None, False)
+        output = plan.render_many([("10.0.0.1", {"pwr": "1"}), ("10.0.0.2", {})])
+        assert output == "[10.0.0.1]\nPower: ON\n[10.0.0.2]\n"
+
+    def test_plans_are_compiled_once(self):
+        assert render_plan("filter", False) is render_plan("filter", False)
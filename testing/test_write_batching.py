@@ -0,0 +1,68 @@
+# pylint: disable=invalid-name, missing-class-docstring, missing-function-docstring
+
+from pyairctrl.write_batching import WriteBatching
+
+
+class Device:
+    def __init__(self, batch_result, accepted=("mode", "om")):
+        self.batch_result = batch_result
+        self.accepted = accepted
+        self.batches = 0
+        self.keys = []
+
+    def write_batch(self, values):
+        self.batches += 1
+        return self.batch_result
+
+    def write_key(self, key, value):
+        self.keys.append(key)
+        return key in self.accepted
+
+
+class TestWriteBatching:
+    values = {"mode": "A", "om": "2"}
+
+    def test_accepted_batch_is_one_write(self):
+        batching = WriteBatching()
+        device = Device(True)
+        assert batching.write(self.values, device.write_batch, device.write_key) == {
+            "mode": True,
+            "om": True,
+        }
+        assert device.batches == 1
+        assert device.keys == []
+        assert batching.supported
+
+    def test_single_key_is_not_batched(self):
+        device = Device(True)
+        WriteBatching().write({"mode": "A"}, device.write_batch, device.write_key)
+        assert device.batches == 0
+        assert device.keys == ["mode"]
+
+    def test_rejected_batch_turns_batching_off(self):
+        batching = WriteBatching()
+        device = Device(False)
+        batching.write(self.values, device.write_batch, device.write_key)
+        assert device.keys == ["mode", "om"]
+        assert batching.supported is False
+        batching.write(self.values, device.write_batch, device.write_key)
+        assert device.batches == 1
+        assert device.keys == ["mode", "om", "mode", "om"]
+
+    def test_unanswered_batch_is_tried_again(self):
+        batching = WriteBatching()
+        device = Device(None)
+        batching.write(self.values, device.write_batch, device.write_key)
+        assert device.keys == ["mode", "om"]
+        assert batching.supported is None
+        device.batch_result = True
+        batching.write(self.values, device.write_batch, device.write_key)
+        assert device.batches == 2
+        assert batching.supported
+
+    def test_rejected_key_keeps_batching(self):
+        batching = WriteBatching()
+        device = Device(False, accepted=("mode",))
+        result = batching.write(self.values, device.write_batch, device.write_key)
+        assert result == {"mode": True, "om": False}
+        assert batching.supported is None